@@ -1,189 +1,407 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
-import os
-
-# -----------------------------
-# Load Calculated Metrics
-# -----------------------------
-df = pd.read_csv("calculated_metrics.csv")
+from matplotlib.figure import Figure
 
-# Ensure Date column exists
-if "Date" in df.columns:
-    df["Date"] = pd.to_datetime(df["Date"])
+from app.services import large_data
+from app.services.dashboard_panels import draw_panel, panel_spec
+from app.services.downsample import downsample_indices
 
-# Create folder for saving graphs
-output_folder = "graphs"
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
+# Bump when the drawing code changes, so every chart is rendered again
+RENDERER_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+# Charts rendered in parallel (one process each)
+GRAPH_WORKERS = int(os.environ.get("GRAPH_WORKERS", str(os.cpu_count() or 1)))
+# Charts queued per worker; only their column data is held in memory at once
+GRAPH_TASKS_PER_WORKER = 2
+# Large-data mode: time series are thinned to this many points
+LINE_MAX_POINTS = 2000
 
 # -----------------------------
-# LINE CHARTS / TIME SERIES
+# Chart lists
 # -----------------------------
 line_columns = ["Sales", "Profit", "Net_Profit_%", "Operating_Margin_%", "Daily_Sales",
                 "Avg_Resolution_Time", "Utilization_%", "Stock_Turnover", "On_Time_Delivery_%",
                 "CLV", "CAC", "ROI_%", "Lead_Conversion_Rate_%"]
+area_columns = ["Sales", "Profit", "Daily_Sales"]
+bar_columns = ["Profit_Margin_%","Gross_Margin_%","Conversion_Rate_%","Retention_Rate_%","Churn_Rate_%","Contribution_%"]
+pie_columns = ["Contribution_%"]
+scatter_pairs = [("Sales","Profit"), ("Marketing_Spend","Revenue"), ("CLV","CAC")]
+pairplot_cols = ["Sales", "Profit", "Net_Profit_%", "Operating_Margin_%"]
+funnel_stages = ["Leads","Converted_Leads","Customers"]
 
-for col in line_columns:
-    if col in df.columns and "Date" in df.columns:
-        plt.figure(figsize=(10,5))
-        plt.plot(df["Date"], df[col], marker='o')
-        plt.title(f"{col} Over Time")
-        plt.xlabel("Date")
-        plt.ylabel(col)
-        plt.grid(True)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(f"{output_folder}/{col}_line.png")
-        plt.close()
 
-# -----------------------------
-# AREA / STACKED AREA CHART
-# -----------------------------
-area_columns = ["Sales", "Profit", "Daily_Sales"]
-existing_cols = [col for col in area_columns if col in df.columns and "Date" in df.columns]
-if existing_cols:
-    plt.figure(figsize=(10,5))
-    plt.stackplot(df["Date"], df[existing_cols].T, labels=existing_cols, alpha=0.6)
-    plt.title("Stacked Area Chart")
-    plt.xlabel("Date")
-    plt.ylabel("Value")
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/stacked_area_chart.png")
-    plt.close()
+def plan_charts(df: pd.DataFrame, large: bool = False) -> list[dict]:
+    """
+    Every chart this data allows, as a spec: output file, chart kind, the
+    columns it reads and its options. A chart is re-rendered only when its
+    spec or the data of these columns changes. `large` selects the
+    large-data drawings (binned, closed-form, sampled).
+    """
+    has_date = "Date" in df.columns
+    numeric_cols = df.select_dtypes(include='number').columns.tolist()
+    charts = []
 
-# -----------------------------
-# BAR CHARTS
-# -----------------------------
-bar_columns = ["Profit_Margin_%","Gross_Margin_%","Conversion_Rate_%","Retention_Rate_%","Churn_Rate_%","Contribution_%"]
-for col in bar_columns:
-    if col in df.columns and "Date" in df.columns:
-        plt.figure(figsize=(10,5))
-        sns.barplot(x=df["Date"], y=df[col], palette="viridis")
-        plt.title(f"{col} Over Time")
-        plt.xlabel("Date")
-        plt.ylabel(col)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(f"{output_folder}/{col}_bar.png")
-        plt.close()
+    def add(filename, kind, columns, **options):
+        charts.append({"file": filename, "kind": kind, "columns": list(columns), "options": {"large": large, **options}})
 
-# -----------------------------
-# PIE / DONUT CHARTS
-# -----------------------------
-pie_columns = ["Contribution_%"]
-for col in pie_columns:
-    if col in df.columns:
-        plt.figure(figsize=(7,7))
-        plt.pie(df[col], labels=df.index, autopct='%1.1f%%', startangle=140)
-        plt.title(f"{col} Distribution")
-        plt.tight_layout()
-        plt.savefig(f"{output_folder}/{col}_pie.png")
-        plt.close()
+    # LINE CHARTS / TIME SERIES
+    for col in line_columns:
+        if col in df.columns and has_date:
+            add(f"{col}_line.png", "line", ["Date", col])
 
-# -----------------------------
-# HISTOGRAMS
-# -----------------------------
-numeric_cols = df.select_dtypes(include='number').columns
-for col in numeric_cols:
-    plt.figure(figsize=(8,5))
-    sns.histplot(df[col], bins=10, kde=True, color='skyblue')
-    plt.title(f"Distribution of {col}")
-    plt.xlabel(col)
-    plt.ylabel("Frequency")
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/{col}_hist.png")
-    plt.close()
+    # AREA / STACKED AREA CHART
+    existing_cols = [col for col in area_columns if col in df.columns and has_date]
+    if existing_cols:
+        add("stacked_area_chart.png", "stacked_area", ["Date"] + existing_cols)
 
-# -----------------------------
-# BOX / VIOLIN PLOTS
-# -----------------------------
-for col in numeric_cols:
-    plt.figure(figsize=(8,5))
-    sns.boxplot(x=df[col], color='lightgreen')
-    plt.title(f"Boxplot of {col}")
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/{col}_box.png")
-    plt.close()
-
-    plt.figure(figsize=(8,5))
-    sns.violinplot(x=df[col], color='lightblue')
-    plt.title(f"Violin Plot of {col}")
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/{col}_violin.png")
-    plt.close()
+    # BAR CHARTS
+    for col in bar_columns:
+        if col in df.columns and has_date:
+            add(f"{col}_bar.png", "bar", ["Date", col])
 
-# -----------------------------
-# SCATTER PLOTS (Relationships)
-# -----------------------------
-scatter_pairs = [("Sales","Profit"), ("Marketing_Spend","Revenue"), ("CLV","CAC")]
-for x,y in scatter_pairs:
-    if x in df.columns and y in df.columns:
-        plt.figure(figsize=(8,5))
-        sns.scatterplot(x=df[x], y=df[y])
-        sns.regplot(x=df[x], y=df[y], scatter=False, color='red')  # trendline
-        plt.title(f"{y} vs {x}")
-        plt.xlabel(x)
-        plt.ylabel(y)
-        plt.tight_layout()
-        plt.savefig(f"{output_folder}/{x}_vs_{y}_scatter.png")
-        plt.close()
+    # PIE / DONUT CHARTS (slices are labelled with the row index, or row ranges for large data)
+    for col in pie_columns:
+        if col in df.columns:
+            add(f"{col}_pie.png", "pie", [col])
 
-# -----------------------------
-# CORRELATION HEATMAP
-# -----------------------------
-if len(numeric_cols) > 1:
-    plt.figure(figsize=(12,10))
-    sns.heatmap(df[numeric_cols].corr(), annot=True, fmt=".2f", cmap="coolwarm")
-    plt.title("Correlation Between Metrics")
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/correlation_heatmap.png")
-    plt.close()
+    # HISTOGRAMS, BOX / VIOLIN PLOTS
+    for col in numeric_cols:
+        add(f"{col}_hist.png", "hist", [col])
+        add(f"{col}_box.png", "box", [col])
+        add(f"{col}_violin.png", "violin", [col])
+
+    # SCATTER PLOTS (Relationships)
+    for x, y in scatter_pairs:
+        if x in df.columns and y in df.columns:
+            add(f"{x}_vs_{y}_scatter.png", "scatter", [x, y])
+
+    # CORRELATION HEATMAP
+    if len(numeric_cols) > 1:
+        add("correlation_heatmap.png", "heatmap", numeric_cols)
+
+    # PAIRPLOT
+    existing_pair_cols = [col for col in pairplot_cols if col in df.columns]
+    if len(existing_pair_cols) >= 2:
+        add("pairplot.png", "pairplot", existing_pair_cols)
+
+    # CUMULATIVE / ROLLING
+    if "Sales" in df.columns and has_date:
+        add("cumulative_rolling_sales.png", "cumulative", ["Date", "Sales"])
+
+    # SIMPLE FUNNEL-LIKE PLOT (Leads → Converted Leads → Customers)
+    if all(col in df.columns for col in funnel_stages):
+        add("funnel_leads.png", "funnel", funnel_stages)
+
+    return charts
+
+
+def column_hashes(df: pd.DataFrame) -> dict[str, str]:
+    # Includes the index, which labels the pie slices
+    return {
+        col: hashlib.sha1(pd.util.hash_pandas_object(df[col], index=True).to_numpy().tobytes()).hexdigest()
+        for col in df.columns
+    }
+
+
+def chart_fingerprint(chart: dict, hashes: dict[str, str]) -> str:
+    identity = json.dumps({
+        "renderer": RENDERER_VERSION,
+        "spec": chart,
+        "inputs": [hashes[col] for col in chart["columns"]],
+    }, sort_keys=True)
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
 
-# -----------------------------
-# PAIRPLOT
-# -----------------------------
-pairplot_cols = ["Sales", "Profit", "Net_Profit_%", "Operating_Margin_%"]
-existing_pair_cols = [col for col in pairplot_cols if col in df.columns]
-if len(existing_pair_cols) >= 2:
-    sns.pairplot(df[existing_pair_cols])
-    plt.savefig(f"{output_folder}/pairplot.png")
-    plt.close()
 
 # -----------------------------
-# CUMULATIVE / ROLLING
+# Rendering (runs in the worker processes)
 # -----------------------------
-if "Sales" in df.columns:
-    plt.figure(figsize=(10,5))
-    plt.plot(df["Date"], df["Sales"].cumsum(), marker='o', label="Cumulative Sales")
-    if "Sales" in df.columns:
-        plt.plot(df["Date"], df["Sales"].rolling(3).mean(), marker='x', label="3M Rolling Avg")
-    plt.title("Cumulative Sales & Rolling Average")
-    plt.xlabel("Date")
-    plt.ylabel("Sales")
-    plt.legend()
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/cumulative_rolling_sales.png")
-    plt.close()
+
+def thin_rows(data: pd.DataFrame, col: str, max_points: int = LINE_MAX_POINTS) -> pd.DataFrame:
+    # Shape-preserving (LTTB) selection of the rows a time series is drawn with
+    if len(data) <= max_points:
+        return data
+    values = pd.to_numeric(data[col], errors="coerce").fillna(0).to_numpy()
+    return data.iloc[downsample_indices(np.arange(len(values)), values, max_points, "lttb")]
+
+
+def draw_chart(kind: str, data: pd.DataFrame, options: dict) -> Figure:
+    """
+    Draws one chart on its own Figure (object-oriented API, no pyplot state),
+    except the small-data pairplot, which seaborn builds on its own figure.
+    In large-data mode the cost stops growing with the row count: histograms,
+    box and violin plots are drawn from bins and quantiles, scatter plots as
+    hexbin density with a closed-form trendline, time series and bars are
+    thinned and pie slices are row ranges.
+    """
+    large = options.get("large", False)
+
+    if kind == "pairplot":
+        if not large:
+            return sns.pairplot(data).figure
+        fig = Figure(figsize=(2.5 * data.shape[1], 2.5 * data.shape[1]))
+        large_data.draw_pairgrid(fig, data)
+        fig.tight_layout()
+        return fig
+
+    sizes = {"pie": (7, 7), "heatmap": (12, 10), "funnel": (6, 5), "hist": (8, 5), "box": (8, 5), "violin": (8, 5), "scatter": (8, 5)}
+    fig = Figure(figsize=sizes.get(kind, (10, 5)))
+    ax = fig.add_subplot()
+
+    if kind == "line":
+        col = data.columns[1]
+        if large:
+            data = thin_rows(data, col)
+        ax.plot(data["Date"], data[col], marker='o')
+        ax.set_title(f"{col} Over Time")
+        ax.set_xlabel("Date")
+        ax.set_ylabel(col)
+        ax.grid(True)
+        ax.tick_params(axis="x", labelrotation=45)
+
+    elif kind == "stacked_area":
+        cols = data.columns[1:].tolist()
+        if large:
+            data = thin_rows(data, cols[0])
+        ax.stackplot(data["Date"], data[cols].T, labels=cols, alpha=0.6)
+        ax.set_title("Stacked Area Chart")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Value")
+        ax.legend()
+        ax.tick_params(axis="x", labelrotation=45)
+
+    elif kind == "bar":
+        # One viridis bar per date via ax.bar (seaborn's per-hue barplot costs
+        # seconds per chart); large data is thinned to min/max bars
+        col = data.columns[1]
+        dates_ms = data["Date"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+        draw_panel(ax, panel_spec({"kind": "bar", "columns": [col], "title": f"{col} Over Time"}, data.get, dates_ms, large))
+
+    elif kind == "pie":
+        col = data.columns[0]
+        if large:
+            labels, values = large_data.bucket_slices(data[col], data.index)
+            ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140)
+        else:
+            ax.pie(data[col], labels=data.index, autopct='%1.1f%%', startangle=140)
+        ax.set_title(f"{col} Distribution")
+
+    elif kind == "hist":
+        col = data.columns[0]
+        if large:
+            large_data.draw_histogram(ax, data[col], color='skyblue')
+        else:
+            sns.histplot(data[col], bins=10, kde=True, color='skyblue', ax=ax)
+        ax.set_title(f"Distribution of {col}")
+        ax.set_xlabel(col)
+        ax.set_ylabel("Frequency")
+
+    elif kind == "box":
+        col = data.columns[0]
+        if large:
+            large_data.draw_box(ax, data[col], color='lightgreen')
+        else:
+            sns.boxplot(x=data[col], color='lightgreen', ax=ax)
+        ax.set_title(f"Boxplot of {col}")
+
+    elif kind == "violin":
+        col = data.columns[0]
+        if large:
+            large_data.draw_violin(ax, data[col], color='lightblue')
+        else:
+            sns.violinplot(x=data[col], color='lightblue', ax=ax)
+        ax.set_title(f"Violin Plot of {col}")
+
+    elif kind == "scatter":
+        x, y = data.columns
+        if large:
+            large_data.draw_density_scatter(ax, data[x], data[y])
+            large_data.draw_regression_line(ax, data[x], data[y], color='red')  # trendline
+        else:
+            sns.scatterplot(x=data[x], y=data[y], ax=ax)
+            sns.regplot(x=data[x], y=data[y], scatter=False, color='red', ax=ax)  # trendline
+        ax.set_title(f"{y} vs {x}")
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+
+    elif kind == "heatmap":
+        sns.heatmap(data.corr(), annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
+        ax.set_title("Correlation Between Metrics")
+
+    elif kind == "cumulative":
+        data = data.assign(Cumulative=data["Sales"].cumsum(), Rolling=data["Sales"].rolling(3).mean())
+        if large:
+            data = thin_rows(data, "Cumulative")
+        ax.plot(data["Date"], data["Cumulative"], marker='o', label="Cumulative Sales")
+        ax.plot(data["Date"], data["Rolling"], marker='x', label="3M Rolling Avg")
+        ax.set_title("Cumulative Sales & Rolling Average")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Sales")
+        ax.legend()
+        ax.grid(True)
+        ax.tick_params(axis="x", labelrotation=45)
+
+    elif kind == "funnel":
+        values = [data[stage].sum() for stage in funnel_stages]
+        ax.barh(funnel_stages, values, color=['skyblue','orange','green'])
+        ax.set_title("Funnel: Leads → Converted Leads → Customers")
+        ax.set_xlabel("Count")
+
+    else:
+        raise ValueError(f"Unknown chart kind: {kind}")
+
+    fig.tight_layout()
+    return fig
+
+
+def render_chart(chart: dict, data: pd.DataFrame, path: str) -> float:
+    """Renders one chart to `path` and returns the seconds it took."""
+    started = time.perf_counter()
+    fig = draw_chart(chart["kind"], data, chart["options"])
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    fig.savefig(tmp_path)
+    os.replace(tmp_path, path)
+    # Only the pairplot figure is registered with pyplot
+    plt.close(fig)
+    return time.perf_counter() - started
+
 
 # -----------------------------
-# SIMPLE FUNNEL-LIKE PLOT (Leads → Converted Leads → Customers)
+# Batch run
 # -----------------------------
-if all(col in df.columns for col in ["Leads","Converted_Leads","Customers"]):
-    stages = ["Leads","Converted_Leads","Customers"]
-    values = [df[stage].sum() for stage in stages]
-    plt.figure(figsize=(6,5))
-    plt.barh(stages, values, color=['skyblue','orange','green'])
-    plt.title("Funnel: Leads → Converted Leads → Customers")
-    plt.xlabel("Count")
-    plt.tight_layout()
-    plt.savefig(f"{output_folder}/funnel_leads.png")
-    plt.close()
-
-print(f"\n All possible graphs generated and saved in the folder '{output_folder}'")
+
+def load_manifest(output_folder: str) -> dict:
+    try:
+        with open(os.path.join(output_folder, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"charts": {}}
+
+
+def write_manifest(output_folder: str, manifest: dict):
+    path = os.path.join(output_folder, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def chart_data(df: pd.DataFrame, chart: dict) -> pd.DataFrame:
+    data = df[chart["columns"]]
+    # The large-data pairplot only needs a representative sample
+    if chart["kind"] == "pairplot" and chart["options"]["large"]:
+        data = large_data.sample_frame(data)
+    return data
+
+
+def generate_graphs(input_file: str = "calculated_metrics.csv", output_folder: str = "graphs",
+                    workers: int = GRAPH_WORKERS, force: bool = False, large: bool | None = None) -> dict:
+    """
+    Renders every chart of `input_file` into `output_folder` on a process
+    pool. Charts whose spec and input columns are unchanged since the last
+    run (per the manifest) are skipped. `large` forces large-data mode on or
+    off; by default it is on above large_data.LARGE_DATA_ROWS rows. Writes
+    and returns the manifest of outputs and render times.
+    """
+    started = time.perf_counter()
+
+    # -----------------------------
+    # Load Calculated Metrics
+    # -----------------------------
+    df = pd.read_csv(input_file)
+
+    # Ensure Date column exists
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"])
+
+    # Create folder for saving graphs
+    os.makedirs(output_folder, exist_ok=True)
+
+    previous = load_manifest(output_folder)["charts"]
+    hashes = column_hashes(df)
+    if large is None:
+        large = large_data.is_large(len(df))
+    charts = plan_charts(df, large)
+
+    entries = {}
+    pending = []
+    for chart in charts:
+        fingerprint = chart_fingerprint(chart, hashes)
+        old = previous.get(chart["file"])
+        if (not force and old and old.get("fingerprint") == fingerprint and old.get("status") == "ok"
+                and os.path.exists(os.path.join(output_folder, chart["file"]))):
+            entries[chart["file"]] = {**old, "skipped": True}
+        else:
+            pending.append((chart, fingerprint))
+
+    print(f"{len(charts)} charts: {len(charts) - len(pending)} unchanged, {len(pending)} to render on {workers} workers"
+          + (" (large-data mode)" if large else ""))
+
+    if pending:
+        # "spawn" gives every worker a clean matplotlib; each task ships only the columns it draws
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            queue = iter(pending)
+            futures = {}
+
+            def submit_next() -> bool:
+                item = next(queue, None)
+                if item is None:
+                    return False
+                chart = item[0]
+                # The columns are copied for a chart only when it is about to run
+                futures[pool.submit(render_chart, chart, chart_data(df, chart), os.path.join(output_folder, chart["file"]))] = item
+                return True
+
+            while len(futures) < workers * GRAPH_TASKS_PER_WORKER and submit_next():
+                pass
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chart, fingerprint = futures.pop(future)
+                    entry = {"kind": chart["kind"], "columns": chart["columns"], "fingerprint": fingerprint,
+                             "rendered_at": time.time(), "skipped": False}
+                    try:
+                        entry.update(status="ok", render_seconds=round(future.result(), 4))
+                    except Exception as e:
+                        print(f"Could not render {chart['file']}: {e}")
+                        entry.update(status="error", error=str(e))
+                    entries[chart["file"]] = entry
+                    submit_next()
+
+    manifest = {
+        "input": os.path.abspath(input_file),
+        "generated_at": time.time(),
+        "total_seconds": round(time.perf_counter() - started, 4),
+        "large_data": large,
+        "rendered": len(pending),
+        "skipped": len(charts) - len(pending),
+        "charts": {chart["file"]: entries[chart["file"]] for chart in charts},
+    }
+    write_manifest(output_folder, manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every chart of a metrics CSV.")
+    parser.add_argument("--input", default="calculated_metrics.csv")
+    parser.add_argument("--output", default="graphs")
+    parser.add_argument("--workers", type=int, default=GRAPH_WORKERS)
+    parser.add_argument("--force", action="store_true", help="re-render charts whose inputs are unchanged")
+    parser.add_argument("--large-data", choices=["auto", "on", "off"], default="auto",
+                        help=f"binned/sampled drawings (auto: above {large_data.LARGE_DATA_ROWS} rows)")
+    args = parser.parse_args()
+
+    large = {"auto": None, "on": True, "off": False}[args.large_data]
+    manifest = generate_graphs(args.input, args.output, args.workers, args.force, large)
+    print(f"\n All possible graphs generated and saved in the folder '{args.output}' "
+          f"({manifest['rendered']} rendered, {manifest['skipped']} unchanged, {manifest['total_seconds']}s)")
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Form, Response
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse
 import os
+import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -8,21 +9,18 @@ from typing import Optional
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 
-# Supabase Library
-from supabase import create_client, Client
-# Add this to your imports at the top of auth.py
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+# Supabase Access (async, pooled)
+from app.services.supabase_db import db
+# Google ID tokens are verified locally against cached signing certs
+from app.services.google_certs import google_certs
+
+from app.services.http_cache import conditional_response, make_etag
+from app.services.user_cache import user_cache
 
 # =================================================================
 #  CONFIGURATION
 # =================================================================
 
-# --- Supabase Connection ---
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
-
 # --- Password Hashing Setup ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -31,6 +29,9 @@ SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# --- Anonymous Session Cookie (owns uploaded datasets for logged-out visitors) ---
+SESSION_COOKIE_NAME = "morph_session"
+
 # --- Router Setup ---
 router = APIRouter()
 
@@ -64,12 +65,22 @@ async def get_current_user(request: Request):
     except JWTError:
         return None
     
-    # Check the REAL database
-    user_response = supabase.table('users').select("*").eq('email', email).execute()
-    if not user_response.data:
-        return None
-        
-    return user_response.data[0]
+    # Check the REAL database (cached per subject; concurrent misses share one query)
+    return await user_cache.get(email, lambda: db.get_user(email))
+
+async def get_dataset_owner(request: Request, response: Response, current_user: Optional[dict] = Depends(get_current_user)) -> str:
+    """
+    Identifies whose dataset a request works on: the logged-in user if there
+    is one, otherwise an anonymous session that is created on first use.
+    """
+    if current_user:
+        return f"user:{current_user['email']}"
+
+    session_id = request.cookies.get(SESSION_COOKIE_NAME)
+    if not session_id:
+        session_id = secrets.token_urlsafe(16)
+        response.set_cookie(key=SESSION_COOKIE_NAME, value=session_id, httponly=True, samesite="lax")
+    return f"session:{session_id}"
 
 # In backend/app/api/auth.py
 
@@ -78,17 +89,9 @@ async def signup(username: str = Form(...), email: str = Form(...), password: st
     try:
         # We now ONLY call the official Supabase auth function.
         # The database trigger will handle creating the public profile automatically.
-        auth_response = supabase.auth.sign_up({
-            "email": email,
-            "password": password,
-            "options": {
-                "data": {
-                    "username": username
-                }
-            }
-        })
-
-        if not auth_response.user:
+        new_user = await db.sign_up(email, password, {"username": username})
+
+        if not new_user:
             return RedirectResponse(url="/signup?error=Signup+failed,+user+may+already+exist.", status_code=303)
 
     except Exception as e:
@@ -105,14 +108,11 @@ async def login(response: Response, email: str = Form(...), password: str = Form
     try:
         # Use the official Supabase function to sign in.
         # This securely communicates with the auth system.
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": email,
-            "password": password
-        })
+        session = await db.sign_in_with_password(email, password)
         
         # If login is successful, Supabase returns a session object with an access token.
-        if auth_response.session:
-            access_token = auth_response.session.access_token
+        if session:
+            access_token = session["access_token"]
             
             # Create a redirect response and set the access token in a secure cookie.
             redirect_response = RedirectResponse(url="/dashboard", status_code=303)
@@ -139,15 +139,20 @@ async def logout():
 
 
 @router.get("/users/me")
-async def read_users_me(current_user: Optional[dict] = Depends(get_current_user)):
+async def read_users_me(request: Request, current_user: Optional[dict] = Depends(get_current_user)):
     if current_user:
-        return {
+        user_data = {
             "loggedIn": True, 
             "username": current_user.get("username"), 
             "email": current_user.get("email"),
             "credits": current_user.get("graph_credits")
         }
-    return {"loggedIn": False}
+    else:
+        user_data = {"loggedIn": False}
+
+    # Tagged with its own content, so a credit or profile change yields a new ETag
+    etag = make_etag("users/me", sorted(user_data.items()))
+    return conditional_response(request, etag, lambda: JSONResponse(user_data), vary="Cookie")
 
 
 # Add this new route inside auth.py
@@ -161,30 +166,15 @@ async def google_auth_callback(request: Request):
         raise HTTPException(status_code=400, detail="No credential provided")
 
     try:
-        # Verify the ID token with Google
-        id_info = id_token.verify_oauth2_token(
-            credential, 
-            google_requests.Request(), 
-            os.environ.get("GOOGLE_CLIENT_ID")
-        )
+        # Verify the ID token locally (Google's certs are cached for their max-age)
+        id_info = await google_certs.verify(credential, os.environ.get("GOOGLE_CLIENT_ID"))
 
         email = id_info.get('email')
         username = id_info.get('name')
 
-        # Check if user exists in your database
-        user_response = supabase.table('users').select("*").eq('email', email).execute()
-
-        if not user_response.data:
-            # If user doesn't exist, create them
-            supabase.table('users').insert({
-                "username": username,
-                "email": email,
-                # You might want to leave password null for Google users
-            }).execute()
-            # Fetch the new user's data
-            user_response = supabase.table('users').select("*").eq('email', email).execute()
-        
-        user = user_response.data[0]
+        # Create the user on first sign-in; either way the row comes back in the same call
+        user = await db.upsert_google_user(email, username)
+        user_cache.invalidate(email)
         
         # Create an access token and log them in
         access_token = create_access_token(
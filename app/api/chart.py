@@ -48,9 +48,17 @@
 
 
 # app/api/chart.py
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from app.services.file_handler import get_dataframe
+from fastapi import APIRouter, HTTPException, Depends, Request
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+from app.api.auth import get_dataset_owner
+from app.services.dataset_registry import Dataset
+from app.services.downsample import downsample_indices
+from app.services.file_handler import get_dataset
+from app.services.http_cache import conditional_response, make_etag
+from app.services.result_cache import normalize_params, result_cache
+from app.services.serialization import series_response, wants_arrow
+import numpy as np
 import pandas as pd
 
 router = APIRouter()
@@ -58,39 +66,89 @@ router = APIRouter()
 class ChartRequest(BaseModel):
     metric: str
     type: str # Hum type ko abhi bhi le rahe hain, lekin logic metric par depend karega
+    # Numeric series longer than this are downsampled on the server (roughly the chart's pixel width)
+    max_points: Optional[int] = Field(default=None, ge=3)
+    downsample: Literal["lttb", "minmax"] = "lttb"
+    # Aggregate numeric series per calendar bucket of the Date column
+    bucket: Optional[Literal["day", "week", "month", "quarter", "year"]] = None
+    agg: Literal["sum", "mean", "min", "max", "count"] = "sum"
+    # "date" labels are "YYYY-MM-DD" strings, "epoch_ms" sends the Date axis as int64 milliseconds
+    label_format: Literal["date", "epoch_ms"] = "date"
+    # Categorical charts: keep the N most frequent values and fold the rest into "Other"
+    top_n: Optional[int] = Field(default=None, ge=1)
 
 @router.post("/chart")
-async def chart(req: ChartRequest):
-    df = get_dataframe()
-    if df is None:
+def chart(req: ChartRequest, request: Request, owner: str = Depends(get_dataset_owner)):
+    """
+    Returns { labels, values } for a metric. Send Accept: application/vnd.apache.arrow.stream
+    to receive the series as typed Arrow buffers instead of JSON.
+    """
+    dataset = get_dataset(owner)
+    if dataset is None:
         raise HTTPException(status_code=400, detail="No data available. Upload a file first.")
 
+    # 'type' doesn't change the series, so it is left out of the cache key
+    params = req.model_dump(exclude={"type"})
+
+    def respond():
+        labels, values = result_cache.get_or_compute(dataset, "chart", params, lambda: build_series(dataset, req))
+        # NumPy arrays go to the encoder as-is; no per-element Python lists
+        return series_response(request, labels, values)
+
+    # The response only changes with a new upload, so clients can revalidate with If-None-Match
+    etag = make_etag(dataset.dataset_id, dataset.version, "chart", normalize_params(params), wants_arrow(request))
+    return conditional_response(request, etag, respond, vary="Accept")
+
+def build_series(dataset: Dataset, req: ChartRequest):
+    """
+    Computes the (labels, values) series a chart request asks for.
+    """
     metric = req.metric
 
-    if metric not in df.columns:
+    # Derived metrics are computed here on first use when lazy metrics are enabled
+    series = dataset.column(metric)
+    if series is None:
         raise HTTPException(status_code=400, detail=f"Metric '{metric}' not found in data.")
 
     # --- KEY CHANGE: YAHAN HUM DATA TYPE CHECK KAR RAHE HAIN ---
     
     # Agar column numeric hai, toh purana logic istemal karein (time series/value trend)
-    if pd.api.types.is_numeric_dtype(df[metric]):
-        if "Date" in df.columns:
-            labels = pd.to_datetime(df["Date"]).dt.strftime('%Y-%m-%d').tolist()
+    if pd.api.types.is_numeric_dtype(series):
+        date_index = dataset.date_index
+        bucket_labels = None
+        if req.bucket:
+            if date_index is None:
+                raise HTTPException(status_code=400, detail="Time buckets need a 'Date' column in the data.")
+            raw_values = pd.to_numeric(series, errors='coerce').to_numpy(dtype="float64", na_value=np.nan)
+            bucket_labels, values = date_index.aggregate(raw_values, req.bucket, req.agg, req.label_format)
         else:
-            labels = list(range(1, len(df) + 1))
-        
-        values = pd.to_numeric(df[metric], errors='coerce').fillna(0).tolist()
+            values = pd.to_numeric(series, errors='coerce').fillna(0).to_numpy()
+        positions = None
+
+        # Shape-preserving downsampling so the payload follows screen size, not row count
+        if req.max_points and len(values) > req.max_points:
+            positions = downsample_indices(np.arange(len(values)), values, req.max_points, req.downsample)
+            values = values[positions]
+
+        # Date labels come from the encodings prepared with the dataset, not from strftime per request
+        if bucket_labels is not None:
+            labels = bucket_labels if positions is None else np.asarray(bucket_labels)[positions].tolist()
+        elif date_index is not None:
+            labels = date_index.row_labels(positions, req.label_format)
+        else:
+            labels = (np.arange(len(values)) if positions is None else positions) + 1
 
     # Agar column categorical (text) hai, toh uski har value ki ginati karein
     else:
-        counts = df[metric].value_counts()
-        labels = counts.index.tolist()
-        values = counts.values.tolist()
-
-    return {
-        "status": "success",
-        "labels": labels,
-        "values": values
-    }
+        # Counts are cached per dataset version, so repeat requests don't rescan the column
+        categories, counts = dataset.value_counts(metric)
+        if req.top_n is not None and len(categories) > req.top_n:
+            labels = categories[:req.top_n].tolist() + ["Other"]
+            values = np.append(counts[:req.top_n], counts[req.top_n:].sum())
+        else:
+            labels = categories.tolist()
+            values = counts
+
+    return labels, values
 
 
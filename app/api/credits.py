@@ -3,18 +3,20 @@
 # ====================
 # IMPORTS
 # ====================
-from fastapi import APIRouter, Depends, HTTPException, Response, Request, Header
-from supabase import Client
+from fastapi import APIRouter, Depends, HTTPException, Response, Request, Header, Query
 import os
 import razorpay
 import json
-from supabase import create_client, Client
-import supabase
 from .auth import get_current_user # Import your user dependency
+from app.services.supabase_db import db
+from app.services.user_cache import user_cache
 
 # ====================
 # CONFIGURATION
 # ====================
+# Most credits one request may consume (a dashboard takes one per chart in a single call)
+MAX_CREDITS_PER_REQUEST = int(os.environ.get("MAX_CREDITS_PER_REQUEST", "50"))
+
 # supabase_url = os.environ.get("SUPABASE_URL")
 # supabase_key = os.environ.get("SUPABASE_KEY")
 # supabase: Client = Client(supabase_url, supabase_key)
@@ -33,10 +35,14 @@ router = APIRouter()
 # ====================
 
 @router.post("/use-credit")
-async def use_credit(current_user: dict = Depends(get_current_user)):
+async def use_credit(
+    count: int = Query(1, ge=1, le=MAX_CREDITS_PER_REQUEST),
+    current_user: dict = Depends(get_current_user),
+):
     """
-    Checks if a user has credits, deducts one if they do,
-    and returns the new credit count.
+    Deducts `count` credits (default one) if the user has that many, and
+    returns the new credit count. Check and decrement are one atomic
+    database call, so concurrent chart generations cannot double-spend.
     """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -44,20 +50,20 @@ async def use_credit(current_user: dict = Depends(get_current_user)):
     user_email = current_user.get("email")
 
     try:
-        user_profile_response = supabase.table('users').select('graph_credits').eq('email', user_email).single().execute()
+        result = await db.consume_credits(user_email, count)
         
-        if not user_profile_response.data:
+        if result is None:
             raise HTTPException(status_code=404, detail="User profile not found")
 
-        current_credits = user_profile_response.data.get('graph_credits', 0)
-
-        if current_credits > 0:
-            new_credits = current_credits - 1
-            updated_user = supabase.table('users').update({'graph_credits': new_credits}).eq('email', user_email).execute()
-            return {"status": "success", "credits_remaining": new_credits}
+        if result["consumed"]:
+            # The cached record still has the old balance
+            user_cache.invalidate(user_email)
+            return {"status": "success", "credits_used": count, "credits_remaining": result["credits_remaining"]}
         else:
-            return {"status": "insufficient_credits", "credits_remaining": 0}
+            return {"status": "insufficient_credits", "credits_remaining": result["credits_remaining"]}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"--- CREDIT ERROR: {e} ---")
         raise HTTPException(status_code=500, detail="An error occurred while processing credits.")
@@ -1,88 +1,169 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Literal
+import asyncio
+import base64
 import os
+import time
+import numpy as np
+import orjson
 import pandas as pd
-import matplotlib.pyplot as plt
-import base64
-from io import BytesIO
-
-if os.path.exists(CSV_FILE):
- df = pd.read_csv(CSV_FILE)
-elif DATAFRAME is not None:
- df = DATAFRAME
-
-
-if df is None or df.empty:
- raise HTTPException(status_code=400, detail="No data available. Upload a file first.")
-
-
-out = {
-"total_sales": float(pd.to_numeric(df.get("Sales", pd.Series(dtype=float)), errors="coerce").fillna(0).sum()),
-"avg_profit": float(pd.to_numeric(df.get("Profit", pd.Series(dtype=float)), errors="coerce").mean() or 0),
-"max_profit": float(pd.to_numeric(df.get("Profit", pd.Series(dtype=float)), errors="coerce").max() or 0),
-"min_profit": float(pd.to_numeric(df.get("Profit", pd.Series(dtype=float)), errors="coerce").min() or 0),
-}
-return out
-
-
-@router.post("/chart")
-async def chart(req: ChartRequest):
-"""
-Return a base64 PNG of the requested metric as a line/bar plot.
-X-axis will be 'Date' if present, else the DataFrame index.
-"""
-# Prefer the saved CSV so a refresh still works without re-upload
-if os.path.exists(CSV_FILE):
- df = pd.read_csv(CSV_FILE)
-elif DATAFRAME is not None:
- df = DATAFRAME.copy()
-else:
- raise HTTPException(status_code=400, detail="No data available. Upload a file first.")
-
-
-metric = req.metric
-chart_type = req.type.lower()
-
-
-if metric not in df.columns:
- raise HTTPException(status_code=400, detail=f"Metric '{metric}' not found in data.")
-
-
-# X-axis selection
-x = None
-if "Date" in df.columns:
-# Try to parse for nicer tick rendering; fallback silently
-try:
-x = pd.to_datetime(df["Date"]) # converts if possible
-except Exception:
-x = df["Date"].astype(str)
-else:
-x = df.index # fallback
-
-
-y = pd.to_numeric(df[metric], errors="coerce")
-
-
-plt.figure(figsize=(10, 5))
-if chart_type == "line":
- plt.plot(x, y, marker="o")
-elif chart_type == "bar":
- plt.bar(x, y)
-else:
- raise HTTPException(status_code=400, detail="Invalid chart type. Use 'line' or 'bar'.")
-
-
-plt.title(f"{metric} Over Time")
-plt.xlabel("Date" if "Date" in df.columns else "Index")
-plt.ylabel(metric)
-plt.xticks(rotation=45)
-plt.tight_layout()
-
-
-buf = BytesIO()
-plt.savefig(buf, format="png")
-buf.seek(0)
-img_base64 = base64.b64encode(buf.read()).decode("utf-8")
-plt.close()
-
 
-return {"image": f"data:image/png;base64,{img_base64}"}
\ No newline at end of file
+from app.api.auth import get_dataset_owner
+from app.api.chart import ChartRequest, build_series
+from app.services import large_data
+from app.services.chart_render import IMAGE_MEDIA_TYPES, render_cache, render_key
+from app.services.dashboard_panels import panel_spec, plan_panels, render_panel
+from app.services.dataset_registry import Dataset
+from app.services.file_handler import get_dataset
+from app.services.http_cache import conditional_response, etag_matches
+from app.services.result_cache import result_cache
+from fastapi.concurrency import run_in_threadpool
+
+router = APIRouter()
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+# Chart images of text columns show this many most frequent values, the rest as "Other"
+CHART_IMAGE_TOP_N = int(os.environ.get("CHART_IMAGE_TOP_N", "30"))
+
+
+@router.get("/chart/image")
+async def chart_image(
+    request: Request,
+    metric: str,
+    type: Literal["line", "bar"] = "line",
+    width: int = Query(800, ge=200, le=4000),
+    height: int = Query(400, ge=150, le=4000),
+    format: Literal["png", "svg"] = "png",
+    owner: str = Depends(get_dataset_owner),
+):
+    """
+    Returns the requested metric as a PNG or SVG image (for email reports and
+    embeds). X-axis is 'Date' if present, else the row number; text columns
+    are drawn as value counts. Each image is rendered once per dataset version.
+    """
+    dataset = await run_in_threadpool(get_dataset, owner)
+    if dataset is None:
+        raise HTTPException(status_code=400, detail="No data available. Upload a file first.")
+
+    key = render_key(dataset.dataset_id, dataset.version, metric, type, width, height, format)
+    # The key addresses the image content, so it doubles as a strong ETag
+    etag = f'"{key}"'
+
+    body = None
+    if not etag_matches(request, etag):
+        body = await render_cache.get_or_render(
+            key, format, lambda: build_render_spec(dataset, metric, type, width, height, format)
+        )
+    return conditional_response(request, etag, lambda: Response(content=body, media_type=IMAGE_MEDIA_TYPES[format]))
+
+
+def build_render_spec(dataset: Dataset, metric: str, chart_type: str, width: int, height: int, image_format: str) -> dict:
+    """
+    Reduces the metric to what fits in the image: numeric series are
+    downsampled to about two points per pixel column and text columns keep
+    their CHART_IMAGE_TOP_N most frequent values, so only a small spec is
+    sent to the render process.
+    """
+    series = dataset.column(metric)
+    categorical = series is not None and not pd.api.types.is_numeric_dtype(series)
+    req = ChartRequest(
+        metric=metric, type=chart_type, max_points=2 * width, label_format="epoch_ms",
+        top_n=CHART_IMAGE_TOP_N if categorical else None,
+    )
+    params = req.model_dump(exclude={"type"})
+    # Same cache entry as the equivalent /chart request
+    labels, values = result_cache.get_or_compute(dataset, "chart", params, lambda: build_series(dataset, req))
+
+    if categorical:
+        x_kind, xlabel = "category", metric
+    elif dataset.date_index is not None:
+        x_kind, xlabel = "time", "Date"
+    else:
+        x_kind, xlabel = "index", "Index"
+
+    return {
+        "x": labels if x_kind == "category" else np.asarray(labels),
+        "x_kind": x_kind,
+        "y": np.asarray(values, dtype="float64"),
+        "metric": metric,
+        "chart_type": chart_type,
+        "xlabel": xlabel,
+        "ylabel": "Count" if x_kind == "category" else metric,
+        "width": width,
+        "height": height,
+        "format": image_format,
+    }
+
+
+@router.get("/dashboard/stream")
+async def dashboard_stream(
+    format: Literal["ndjson", "sse"] = "ndjson",
+    image: Literal["png", "svg"] = "png",
+    width: int = Query(600, ge=200, le=2000),
+    height: int = Query(400, ge=150, le=2000),
+    owner: str = Depends(get_dataset_owner),
+):
+    """
+    Streams the multi-panel dashboard (the panels of dashboard_plot.py) as
+    NDJSON lines or server-sent events. A "start" event lists the panels
+    right away, then each "panel" event carries one image as a data URL as
+    soon as it is rendered; panels render concurrently in the render pool
+    and are cached per dataset version. A "done" event ends the stream.
+    """
+    dataset = await run_in_threadpool(get_dataset, owner)
+    if dataset is None:
+        raise HTTPException(status_code=400, detail="No data available. Upload a file first.")
+
+    return StreamingResponse(
+        stream_panels(dataset, width, height, image, format),
+        media_type=STREAM_MEDIA_TYPES[format],
+        # Proxies must pass every event through immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def encode_event(event: str, data: dict, stream_format: str) -> bytes:
+    if stream_format == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n\n"
+    return orjson.dumps({"event": event, **data}, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+
+
+async def stream_panels(dataset: Dataset, width: int, height: int, image_format: str, stream_format: str):
+    started = time.perf_counter()
+    panels = plan_panels(dataset.available_columns(), "Date" in dataset.df.columns)
+    large = large_data.is_large(len(dataset.df))
+    yield encode_event("start", {
+        "panels": [{"index": i, "id": panel["id"], "title": panel["title"]} for i, panel in enumerate(panels)],
+        "large_data": large,
+    }, stream_format)
+
+    def build_spec(panel: dict) -> dict:
+        date_index = dataset.date_index
+        dates_ms = date_index.row_labels(None, "epoch_ms") if date_index is not None else None
+        spec = panel_spec(panel, dataset.column, dates_ms, large)
+        spec.update(width=width, height=height, format=image_format)
+        return spec
+
+    async def render(index: int, panel: dict):
+        key = render_key(dataset.dataset_id, dataset.version, panel["id"], "dashboard", width, height, image_format)
+        try:
+            body = await render_cache.get_or_render(key, image_format, lambda: build_spec(panel), render=render_panel)
+        except Exception as e:
+            print(f"Could not render dashboard panel {panel['id']}: {e}")
+            return "error", {"index": index, "id": panel["id"], "error": str(e)}
+        return "panel", {
+            "index": index,
+            "id": panel["id"],
+            "title": panel["title"],
+            "image": f"data:{IMAGE_MEDIA_TYPES[image_format]};base64,{base64.b64encode(body).decode('ascii')}",
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    # Renders that outlive a disconnected client still finish and land in the cache
+    tasks = [asyncio.ensure_future(render(i, panel)) for i, panel in enumerate(panels)]
+    for next_done in asyncio.as_completed(tasks):
+        event, data = await next_done
+        yield encode_event(event, data, stream_format)
+
+    yield encode_event("done", {"panels": len(panels), "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}, stream_format)
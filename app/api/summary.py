@@ -27,14 +27,15 @@
 
 
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.api.auth import get_dataset_owner
 from app.services.file_handler import get_dataframe
 
 router = APIRouter(prefix="/api", tags=["summary"])
 
 @router.get("/summary")
-async def get_summary():
-    df = get_dataframe()
+async def get_summary(owner: str = Depends(get_dataset_owner)):
+    df = get_dataframe(owner)
     if df is None:
         return {"error": "No file uploaded"}
     result = {}
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse
+from typing import Literal, Optional
+from datetime import date
+import pandas as pd
+
+from app.api.auth import get_dataset_owner
+from app.services.dataset_registry import Dataset
+from app.services.file_handler import get_dataset
+from app.services.http_cache import conditional_response, make_etag
+from app.services.time_intelligence import TimeCube
+
+router = APIRouter()
+
+
+def get_time_cube(owner: str, metric: str) -> tuple[Dataset, TimeCube]:
+    dataset = get_dataset(owner)
+    if dataset is None:
+        raise HTTPException(status_code=400, detail="No data available. Upload a file first.")
+    series = dataset.column(metric)
+    if series is None:
+        raise HTTPException(status_code=400, detail=f"Metric '{metric}' not found in data.")
+    if not pd.api.types.is_numeric_dtype(series):
+        raise HTTPException(status_code=400, detail=f"Metric '{metric}' is not numeric.")
+    cube = dataset.time_cube(metric)
+    if cube is None or cube.last_day is None:
+        raise HTTPException(status_code=400, detail="Time intelligence needs a 'Date' column with valid dates.")
+    return dataset, cube
+
+
+@router.get("/time-intelligence")
+def time_intelligence(request: Request, metric: str = "Sales", as_of: Optional[date] = None, owner: str = Depends(get_dataset_owner)):
+    """
+    MTD, QTD, YTD, YoY, MoM and CAGR of a metric up to `as_of` (default: the
+    latest date in the data). Periods are calendar periods of the right year;
+    the per-period totals are rolled up once per dataset version, so each
+    request is a lookup.
+    """
+    dataset, cube = get_time_cube(owner, metric)
+    etag = make_etag(dataset.dataset_id, dataset.version, "time-intelligence", metric, as_of)
+    return conditional_response(request, etag, lambda: JSONResponse(content={"metric": metric, **cube.kpis(as_of)}))
+
+
+@router.get("/time-intelligence/rollup")
+def time_intelligence_rollup(
+    request: Request,
+    metric: str = "Sales",
+    period: Literal["day", "month", "quarter", "year"] = "month",
+    owner: str = Depends(get_dataset_owner),
+):
+    """
+    Total of a metric per calendar day, month, quarter or year (periods
+    without data are left out).
+    """
+    dataset, cube = get_time_cube(owner, metric)
+    etag = make_etag(dataset.dataset_id, dataset.version, "time-intelligence-rollup", metric, period)
+
+    def respond():
+        labels, totals = cube.rollup(period)
+        return JSONResponse(content={"metric": metric, "period": period, "labels": labels, "values": totals.tolist()})
+
+    return conditional_response(request, etag, respond)
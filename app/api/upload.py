@@ -1,16 +1,18 @@
-import os
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-from app.services.file_handler import save_file
+from app.api.auth import get_dataset_owner
+from app.services import ingest_jobs
+from app.services.file_handler import is_supported_file
+from app.services.storage import dataset_id
 
 router = APIRouter()
-UPLOAD_DIR = "uploads_files"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(response: Response, file: UploadFile = File(...), owner: str = Depends(get_dataset_owner)):
     """
-    Upload a CSV/Excel file and load into DataFrame.
+    Upload a CSV/Excel file. Parsing and metric calculation run in the
+    background ingest pool; poll /api/upload/status/{job_id} for progress.
     """
     if not file:
         return JSONResponse(
@@ -18,17 +20,40 @@ async def upload_file(file: UploadFile = File(...)):
             status_code=400,
         )
 
-    result = await save_file(file)
-
-    if not result["success"]:
+    if not file.filename or not is_supported_file(file.filename):
         return JSONResponse(
             {"status": "error", "message": "Unsupported or invalid file format"},
             status_code=400,
         )
 
+    job_id, raw_path, size = await run_in_threadpool(ingest_jobs.stage_upload, file.file, file.filename)
+    await run_in_threadpool(ingest_jobs.submit_ingest, job_id, owner, raw_path, file.filename, size)
+
+    # Returned as a plain dict so the session cookie set by get_dataset_owner is kept
+    response.status_code = 202
+    return {
+        "status": "accepted",
+        "job_id": job_id,
+        "filename": file.filename,
+        "size": size,
+        "status_url": f"/api/upload/status/{job_id}",
+    }
+
+@router.get("/upload/status/{job_id}")
+async def upload_status(job_id: str, owner: str = Depends(get_dataset_owner)):
+    """
+    Reports the parse and metrics progress of an ingest job.
+    """
+    job = await run_in_threadpool(ingest_jobs.get_job, job_id)
+    if job is None or job["dataset_id"] != dataset_id(owner):
+        raise HTTPException(status_code=404, detail="Upload job not found.")
+
     return {
-        "status": "success",
-        "filename": result["filename"],
-        "size": result["size"],
-        "message": "File uploaded and dataframe loaded ✅"
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "rows": job["rows"],
+        "filename": job["filename"],
+        "size": job["size"],
+        "message": job["message"],
     }
@@ -2,18 +2,26 @@
 
 from dotenv import load_dotenv
 load_dotenv()
-from app.api import upload, chart, auth, credits # <-- ADD 'credits' HERE
+from app.api import upload, chart, auth, credits, dashboard, time_intelligence # <-- ADD 'credits' HERE
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
+import math
 import pandas as pd
 from fastapi import Depends
 from fastapi.responses import RedirectResponse
-from app.api.auth import get_current_user # This imports your security guard
+from app.api.auth import get_current_user, get_dataset_owner # This imports your security guard
 # Local application imports
 from app.api import upload, chart, auth  # <-- This line now works because auth.py exists
-from app.services.file_handler import get_dataframe
+from app.services.dataset_registry import registry
+from app.services.file_handler import get_dataset
+from app.services.ingest_jobs import shutdown_pool
+from app.services.chart_render import shutdown_pool as shutdown_render_pool, warm_pool as warm_render_pool
+from app.services.compression import CompressionMiddleware
+from app.services.http_cache import conditional_response, make_etag
+from app.services.result_cache import result_cache
+from app.services.supabase_db import db
 # =================================================================
 #  2. APP INITIALIZATION & CONFIGURATION
 # =================================================================
@@ -32,50 +40,138 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Compress large JSON/Arrow/HTML bodies (brotli or gzip); small ones are sent as-is
+app.add_middleware(CompressionMiddleware)
+
 #  3. API ROUTERS
 
 # Include routers from other files (upload.py, chart.py)
 # API-specific routes (data upload, chart generation, etc.)
 app.include_router(upload.router, prefix="/api")
 app.include_router(chart.router, prefix="/api")
+# Server-rendered PNG/SVG charts
+app.include_router(dashboard.router, prefix="/api")
+# MTD/QTD/YTD/YoY/MoM/CAGR from per-dataset period rollups
+app.include_router(time_intelligence.router, prefix="/api")
 # Top-level routes for authentication (login, signup, logout)
 app.include_router(auth.router) # <-- CORRECTED: The "/api" prefix is removed
 
 
 app.include_router(credits.router, prefix="/api") # <-- ADD THIS LINE
+
+# Start the render processes with the server, so the first image isn't held up by process spawn
+@app.on_event("startup")
+def start_render_pool():
+    warm_render_pool(("app.services.dashboard_panels",))
+
+# Stop the background ingest and render processes together with the server
+@app.on_event("shutdown")
+def stop_worker_pools():
+    shutdown_pool()
+    shutdown_render_pool()
+
+# Close the pooled Supabase connections
+@app.on_event("shutdown")
+async def close_database():
+    await db.close()
+
 #  4. CORE API ENDPOINTS
+def _json_number(value) -> float:
+    # An empty column gives NaN, which JSON cannot carry; report 0 like before
+    value = float(value)
+    return value if math.isfinite(value) else 0
+
+def build_summary(dataset) -> dict:
+    """
+    Summary statistics and column types of a dataset. Every column is
+    converted or scanned at most once.
+    """
+    df = dataset.df
+    numeric_columns = df.select_dtypes(include='number').columns.tolist()
+    # Lazy derived metrics are numeric too, even before they are computed
+    numeric_columns += [col for col in dataset.available_columns() if col not in df.columns]
+
+    # Distinct values come from the cached per-version value counts
+    categorical_columns = []
+    for col in df.select_dtypes(include=['object', 'category']).columns:
+        if len(dataset.value_counts(col)[0]) < 50:
+            categorical_columns.append(col)
+
+    total_sales = _json_number(pd.to_numeric(df["Sales"], errors='coerce').sum()) if "Sales" in df.columns else 0
+    avg_profit = max_profit = min_profit = 0
+    if "Profit" in df.columns:
+        profit = pd.to_numeric(df["Profit"], errors='coerce')
+        avg_profit = _json_number(profit.mean())
+        max_profit = _json_number(profit.max())
+        min_profit = _json_number(profit.min())
+    return {
+        "total_sales": total_sales,
+        "avg_profit": avg_profit,
+        "max_profit": max_profit,
+        "min_profit": min_profit,
+        "numeric_columns": numeric_columns,
+        "categorical_columns": categorical_columns
+    }
+
 @app.get("/api/summary")
-def get_summary():
+def get_summary(request: Request, owner: str = Depends(get_dataset_owner)):
     """
     Calculates summary statistics and identifies column types from the uploaded data.
+    Results are cached per dataset version and tagged with a version-based ETag.
     """
-    df = get_dataframe()
-    if df is None or df.empty:
+    dataset = get_dataset(owner)
+    if dataset is None or dataset.df.empty:
         return JSONResponse(content={"error": "No data available to summarize."}, status_code=404)
 
     try:
-        numeric_columns = df.select_dtypes(include='number').columns.tolist()
-        
-        categorical_columns = []
-        for col in df.select_dtypes(include=['object', 'category']).columns:
-            if df[col].nunique() < 50:
-                categorical_columns.append(col)
-        total_sales = float(pd.to_numeric(df["Sales"], errors='coerce').sum()) if "Sales" in df.columns else 0
-        avg_profit = float(pd.to_numeric(df["Profit"], errors='coerce').mean()) if "Profit" in df.columns else 0
-        max_profit = float(pd.to_numeric(df["Profit"], errors='coerce').max()) if "Profit" in df.columns else 0
-        min_profit = float(pd.to_numeric(df["Profit"], errors='coerce').min()) if "Profit" in df.columns else 0
-        summary_data = {
-            "total_sales": total_sales,
-            "avg_profit": avg_profit,
-            "max_profit": max_profit,
-            "min_profit": min_profit,
-            "numeric_columns": numeric_columns,
-            "categorical_columns": categorical_columns
-        }
-        return JSONResponse(content=summary_data)
+        etag = make_etag(dataset.dataset_id, dataset.version, "summary")
+        return conditional_response(request, etag, lambda: JSONResponse(
+            content=result_cache.get_or_compute(dataset, "summary", {}, lambda: build_summary(dataset))
+        ))
     except Exception as e:
         return JSONResponse(content={"error": f"An error occurred during summary calculation: {str(e)}"}, status_code=500)
 
+@app.get("/api/cache/stats")
+def get_cache_stats():
+    """
+    Hit rate and size of this worker's result cache.
+    """
+    return result_cache.stats()
+
+@app.get("/api/memory")
+def get_memory_report(owner: str = Depends(get_dataset_owner)):
+    """
+    Reports per-column memory before and after the ingest dtype optimizer,
+    what each column occupies right now (lazily computed metrics included)
+    and the totals of this worker's dataset registry, for sizing workers.
+    """
+    dataset = get_dataset(owner)
+    if dataset is None:
+        return JSONResponse(content={"error": "No data available. Upload a file first."}, status_code=404)
+
+    current = dataset.df.memory_usage(deep=True, index=False)
+    columns = []
+    for entry in dataset.memory_report or []:
+        columns.append({**entry, "bytes_now": int(current.get(entry["column"], 0))})
+    reported = {entry["column"] for entry in columns}
+    for col in dataset.df.columns:
+        if col not in reported:
+            dtype = str(dataset.df[col].dtype)
+            columns.append({
+                "column": col, "dtype_before": dtype, "dtype_after": dtype,
+                "bytes_before": None, "bytes_after": None, "bytes_now": int(current[col]),
+            })
+
+    return {
+        "filename": dataset.filename,
+        "rows": len(dataset.df),
+        "bytes_before": sum(c["bytes_before"] or 0 for c in columns),
+        "bytes_after": sum(c["bytes_after"] or 0 for c in columns),
+        "bytes_now": int(current.sum()),
+        "columns": columns,
+        "worker": registry.stats(),
+    }
+
 # This route serves the main page when you visit the root URL
 @app.get("/", response_class=HTMLResponse)
 async def get_homepage(request: Request):
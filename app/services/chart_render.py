@@ -0,0 +1,247 @@
+# app/services/chart_render.py
+
+import asyncio
+import hashlib
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Callable
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.services import storage
+
+# Matplotlib runs in these worker processes; pyplot's global state is never touched
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", "2"))
+# Rendered images are kept on disk, shared by every worker process of the server
+RENDER_DIR = os.path.join(storage.UPLOAD_DIR, "renders")
+RENDER_CACHE_MAX_FILES = int(os.environ.get("RENDER_CACHE_MAX_FILES", "2000"))
+RENDER_DPI = 100
+
+IMAGE_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    # A render process died (e.g. OOM-killed); the next render starts a fresh pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _preload(modules: tuple[str, ...]):
+    for name in modules:
+        importlib.import_module(name)
+
+
+def warm_pool(modules: tuple[str, ...] = ()):
+    """
+    Starts the render processes and imports the drawing code in them ahead
+    of the first request, so the first chart doesn't wait for process spawn.
+    """
+    pool = _get_pool()
+    for _ in range(RENDER_WORKERS):
+        pool.submit(_preload, modules)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_pool(render: Callable[[dict], bytes], spec: dict) -> bytes:
+    pool = _get_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, render, spec)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+
+def render_key(dataset_id: str, version: int, metric: str, chart_type: str, width: int, height: int, image_format: str) -> str:
+    """
+    Content address of a rendered chart: the same dataset version, metric,
+    chart type and size always give the same image.
+    """
+    identity = f"{dataset_id}|{version}|{metric}|{chart_type}|{width}x{height}|{image_format}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+# =================================================================
+#  RENDERING (runs in the worker processes)
+# =================================================================
+
+def render_chart(spec: dict) -> bytes:
+    """
+    Draws a chart with the object-oriented Figure/Agg API. `spec` holds the
+    already reduced series: x (epoch ms, positions or category labels),
+    x_kind ("time", "index" or "category"), y, and the metric, chart type,
+    size and image format.
+    """
+    fig = Figure(figsize=(spec["width"] / RENDER_DPI, spec["height"] / RENDER_DPI), dpi=RENDER_DPI)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    x = spec["x"]
+    if spec["x_kind"] == "time":
+        x = np.asarray(x, dtype="int64").astype("datetime64[ms]")
+    elif spec["x_kind"] == "category":
+        x = [str(label) for label in x]
+    y = spec["y"]
+
+    if spec["chart_type"] == "bar":
+        ax.bar(x, y)
+    else:
+        ax.plot(x, y, marker="o" if len(y) <= 50 else None, linewidth=1)
+
+    metric = spec["metric"]
+    ax.set_title(f"{metric} by {spec['xlabel']}" if spec["x_kind"] == "category" else f"{metric} Over Time")
+    ax.set_xlabel(spec["xlabel"])
+    ax.set_ylabel(spec["ylabel"])
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.grid(True, axis="y", alpha=0.3)
+    fig.tight_layout()
+
+    buf = BytesIO()
+    fig.savefig(buf, format=spec["format"])
+    return buf.getvalue()
+
+
+# =================================================================
+#  CONTENT-ADDRESSED CACHE
+# =================================================================
+
+class _RenderCancelled(Exception):
+    """Set on a shared render whose leading request was cancelled."""
+
+
+class RenderCache:
+    """
+    Rendered images stored on disk under their content address. A chart is
+    rendered at most once: later requests read the file, and concurrent
+    requests for a chart being rendered wait for that render.
+    """
+
+    def __init__(self, directory: str = RENDER_DIR, max_files: int = RENDER_CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.renders = 0
+
+    def _path(self, key: str, image_format: str) -> str:
+        return os.path.join(self.directory, f"{key}.{image_format}")
+
+    def _read(self, path: str) -> bytes | None:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, body: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self):
+        names = [name for name in os.listdir(self.directory) if not name.endswith(".tmp")]
+        if len(names) <= self.max_files:
+            return
+        paths = [os.path.join(self.directory, name) for name in names]
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except FileNotFoundError:
+                pass
+        for path in sorted(mtimes, key=mtimes.get)[:len(mtimes) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def get_or_render(
+        self, key: str, image_format: str, build_spec: Callable[[], dict],
+        render: Callable[[dict], bytes] = render_chart,
+    ) -> bytes:
+        """
+        Returns the cached image for `key`, or renders it in the process pool
+        from the spec `build_spec` returns (called in a thread, only on a miss).
+        `render` must be a module-level function so it can be sent to the pool.
+        """
+        loop = asyncio.get_running_loop()
+        path = self._path(key, image_format)
+
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                body = await loop.run_in_executor(None, self._read, path)
+                if body is not None:
+                    self.hits += 1
+                    return body
+                # A render may have started, or even finished, while the file was being read
+                inflight = self._inflight.get(key)
+                if inflight is None:
+                    if os.path.exists(path):
+                        self.hits += 1
+                        return await loop.run_in_executor(None, self._read, path)
+                    return await self._render(key, path, build_spec, render)
+            self.hits += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _RenderCancelled:
+                # The request doing the render went away; try again
+                continue
+
+    async def _render(self, key: str, path: str, build_spec: Callable[[], dict], render: Callable[[dict], bytes]) -> bytes:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            spec = await loop.run_in_executor(None, build_spec)
+            body = await run_in_pool(render, spec)
+            self.renders += 1
+            await loop.run_in_executor(None, self._write, path, body)
+        except BaseException as e:
+            # Waiters must always be released, also when this request is cancelled
+            future.set_exception(_RenderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(body)
+            return body
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "renders": self.renders, "rendering": len(self._inflight)}
+
+
+# Shared by the image endpoints of this worker
+render_cache = RenderCache()
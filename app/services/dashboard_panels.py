@@ -0,0 +1,213 @@
+# app/services/dashboard_panels.py
+
+from io import BytesIO
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from app.services import large_data
+from app.services.downsample import downsample_indices
+
+# -----------------------------
+# Define metrics
+# -----------------------------
+line_metrics = ["Sales", "Profit", "Net_Profit_%", "Operating_Margin_%"]
+bar_metrics = ["Profit_Margin_%","Gross_Margin_%","Conversion_Rate_%","Retention_Rate_%","Churn_Rate_%"]
+hist_metrics = ["Daily_Sales","Avg_Resolution_Time","Utilization_%","Stock_Turnover","On_Time_Delivery_%"]
+box_metrics = ["Sales", "Profit", "Net_Profit_%", "Daily_Sales"]
+scatter_pairs = [("Sales","Profit"), ("CLV","CAC")]
+
+# Large-data mode: time series are thinned to this many points, bar charts to this many bars
+PANEL_MAX_POINTS = 1000
+PANEL_MAX_BARS = 200
+PANEL_DPI = 100
+MAX_BAR_TICKS = 30
+
+
+def plan_panels(columns, has_date: bool) -> list[dict]:
+    """
+    The dashboard's panels for the given columns, in display order.
+    """
+    columns = set(columns)
+    panels = []
+
+    def add(kind, cols, title):
+        panels.append({"id": f"{kind}:{'|'.join(cols)}", "kind": kind, "columns": list(cols), "title": title})
+
+    # LINE CHARTS
+    for col_name in line_metrics:
+        if col_name in columns and has_date:
+            add("line", [col_name], col_name)
+    # BAR CHARTS
+    for col_name in bar_metrics:
+        if col_name in columns and has_date:
+            add("bar", [col_name], col_name)
+    # HISTOGRAMS
+    for col_name in hist_metrics:
+        if col_name in columns:
+            add("hist", [col_name], f"Distribution of {col_name}")
+    # BOX PLOTS
+    for col_name in box_metrics:
+        if col_name in columns:
+            add("box", [col_name], f"Boxplot of {col_name}")
+    # SCATTER PLOTS
+    for x_col, y_col in scatter_pairs:
+        if x_col in columns and y_col in columns:
+            add("scatter", [x_col, y_col], f"{y_col} vs {x_col}")
+    # CUMULATIVE + ROLLING SALES
+    if "Sales" in columns and has_date:
+        add("cumulative", ["Sales"], "Cumulative & Rolling Avg Sales")
+    return panels
+
+
+def _numeric(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _thin(values: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray | None:
+    if len(values) <= max_points:
+        return None
+    return downsample_indices(np.arange(len(values)), np.nan_to_num(values), max_points, method)
+
+
+def panel_spec(panel: dict, column: Callable[[str], pd.Series], dates_ms: np.ndarray | None, large: bool) -> dict:
+    """
+    Reduces the data a panel needs to a small, picklable spec. Small data is
+    passed as-is and drawn exactly like before; in large-data mode panels
+    carry bins, quantiles, samples or thinned series instead of every row.
+    `column` looks up a column by name, `dates_ms` is the Date axis in epoch
+    milliseconds (row order).
+    """
+    kind = panel["kind"]
+    spec = {"kind": kind, "title": panel["title"], "columns": panel["columns"], "large": large}
+
+    if kind in ("line", "bar", "cumulative"):
+        values = _numeric(column(panel["columns"][0]))
+        x = dates_ms
+        if kind == "cumulative":
+            sales = pd.Series(values)
+            values = np.column_stack([sales.cumsum().to_numpy(), sales.rolling(3).mean().to_numpy()])
+        if large:
+            if kind == "bar":
+                positions = _thin(values, PANEL_MAX_BARS, "minmax")
+            else:
+                positions = _thin(values if values.ndim == 1 else values[:, 0], PANEL_MAX_POINTS)
+            if positions is not None:
+                x, values = x[positions], values[positions]
+        spec.update(x=x, y=values)
+
+    elif kind == "hist":
+        values = _numeric(column(panel["columns"][0]))
+        if large:
+            spec["counts"], spec["edges"] = large_data.binned_histogram(values)
+        else:
+            spec["values"] = values
+
+    elif kind == "box":
+        values = _numeric(column(panel["columns"][0]))
+        if large:
+            spec["stats"] = large_data.box_stats(values)
+        else:
+            spec["values"] = values
+
+    elif kind == "scatter":
+        x_col, y_col = panel["columns"]
+        x, y = _numeric(column(x_col)), _numeric(column(y_col))
+        if large:
+            # Density from a sample, trendline from every row
+            sample = large_data.sample_frame(pd.DataFrame({"x": x, "y": y}))
+            spec.update(x=sample["x"].to_numpy(), y=sample["y"].to_numpy(), fit=large_data.linear_fit(x, y))
+        else:
+            spec.update(x=x, y=y)
+
+    return spec
+
+
+def draw_panel(ax, spec: dict):
+    kind = spec["kind"]
+    large = spec["large"]
+
+    if kind == "line":
+        col_name = spec["columns"][0]
+        ax.plot(np.asarray(spec["x"]).astype("datetime64[ms]"), spec["y"], marker='o', color='blue')
+        ax.set_xlabel("Date")
+        ax.set_ylabel(col_name)
+        ax.grid(True)
+
+    elif kind == "bar":
+        col_name = spec["columns"][0]
+        # One bar per date in viridis colours, like seaborn's barplot but without
+        # its per-category overhead; tick labels are thinned to stay readable
+        labels = pd.DatetimeIndex(np.asarray(spec["x"]).astype("datetime64[ms]")).strftime("%Y-%m-%d")
+        positions = np.arange(len(labels))
+        ax.bar(positions, spec["y"], color=colormaps["viridis"](np.linspace(0, 1, max(len(labels), 1))))
+        step = max(1, len(labels) // MAX_BAR_TICKS)
+        ax.set_xticks(positions[::step], labels[::step])
+        ax.set_xlabel("Date")
+        ax.set_ylabel(col_name)
+        ax.tick_params(axis='x', rotation=45)
+
+    elif kind == "hist":
+        col_name = spec["columns"][0]
+        if large:
+            ax.stairs(spec["counts"], spec["edges"], fill=True, color='skyblue', alpha=0.8)
+            if len(spec["counts"]):
+                centers, smooth = large_data.smoothed_density(spec["counts"].astype("float64"), spec["edges"])
+                ax.plot(centers, smooth, color="steelblue")
+        else:
+            sns.histplot(spec["values"], bins=10, kde=True, ax=ax, color='skyblue')
+        ax.set_xlabel(col_name)
+        ax.set_ylabel("Frequency")
+
+    elif kind == "box":
+        if large:
+            ax.bxp([spec["stats"]], orientation="horizontal", patch_artist=True,
+                   boxprops={"facecolor": "lightgreen"}, flierprops={"marker": "d", "markersize": 3})
+            ax.set_yticks([])
+        else:
+            sns.boxplot(x=spec["values"], ax=ax, color='lightgreen')
+        ax.set_xlabel(spec["columns"][0])
+
+    elif kind == "scatter":
+        x_col, y_col = spec["columns"]
+        if large:
+            large_data.draw_density_scatter(ax, spec["x"], spec["y"])
+            if spec["fit"] is not None:
+                slope, intercept = spec["fit"]
+                lo, hi = np.nanmin(spec["x"]), np.nanmax(spec["x"])
+                ax.plot([lo, hi], [slope * lo + intercept, slope * hi + intercept], color='red')
+        else:
+            sns.scatterplot(x=spec["x"], y=spec["y"], ax=ax)
+            sns.regplot(x=spec["x"], y=spec["y"], scatter=False, ax=ax, color='red')
+        ax.set_xlabel(x_col)
+        ax.set_ylabel(y_col)
+
+    elif kind == "cumulative":
+        dates = np.asarray(spec["x"]).astype("datetime64[ms]")
+        ax.plot(dates, spec["y"][:, 0], marker='o', label="Cumulative Sales")
+        ax.plot(dates, spec["y"][:, 1], marker='x', label="3M Rolling Avg")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Sales")
+        ax.legend()
+        ax.grid(True)
+
+    else:
+        raise ValueError(f"Unknown panel kind: {kind}")
+
+    ax.set_title(spec["title"])
+
+
+def render_panel(spec: dict) -> bytes:
+    """Renders one panel on its own Figure (runs in the render processes)."""
+    fig = Figure(figsize=(spec["width"] / PANEL_DPI, spec["height"] / PANEL_DPI), dpi=PANEL_DPI)
+    FigureCanvasAgg(fig)
+    draw_panel(fig.add_subplot(), spec)
+    fig.tight_layout()
+    buf = BytesIO()
+    fig.savefig(buf, format=spec["format"])
+    return buf.getvalue()
@@ -0,0 +1,290 @@
+# app/services/dataset_registry.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from app.services import storage
+from app.services.date_index import DateIndex
+from app.services.metrics import METRICS_BY_NAME, applicable_metrics, compute_metrics
+from app.services.time_intelligence import TimeCube
+
+# Total memory all in-memory datasets of this worker may use together
+DATASET_MEMORY_BUDGET_MB = int(os.environ.get("DATASET_MEMORY_BUDGET_MB", "1024"))
+# Datasets not touched for this long are dropped from memory (they stay on disk)
+DATASET_IDLE_SECONDS = int(os.environ.get("DATASET_IDLE_SECONDS", "900"))
+
+
+@dataclass
+class Dataset:
+    owner: str
+    filename: str
+    df: pd.DataFrame | None
+    nbytes: int
+    version: int
+    last_access: float = field(default_factory=time.monotonic)
+    path: str | None = None
+    # Per-column dtypes and sizes before/after the ingest dtype optimizer
+    memory_report: list[dict] | None = None
+    _date_index: DateIndex | None = field(default=None, repr=False, compare=False)
+    # column -> (labels, counts) sorted by count; tied to this dataset version
+    _value_counts: dict = field(default_factory=dict, repr=False, compare=False)
+    # column -> TimeCube of its per-period totals; tied to this dataset version
+    _time_cubes: dict = field(default_factory=dict, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def in_memory(self) -> bool:
+        return self.df is not None
+
+    @property
+    def dataset_id(self) -> str:
+        return storage.dataset_id(self.owner)
+
+    def available_columns(self) -> list[str]:
+        """
+        Raw columns plus every derived metric that can be computed from them,
+        whether or not it has been materialized yet.
+        """
+        columns = list(self.df.columns)
+        present = set(columns)
+        columns += [m.name for m in applicable_metrics(present) if m.name not in present]
+        return columns
+
+    def prepare(self):
+        """
+        Builds the per-dataset indexes as soon as the data is loaded, so the
+        first chart request doesn't pay for them.
+        """
+        self.date_index
+
+    @property
+    def date_index(self) -> DateIndex | None:
+        """
+        Date-sorted index over the Date column, built once per loaded dataset.
+        """
+        if "Date" not in self.df.columns:
+            return None
+        with self._lock:
+            if self._date_index is None:
+                self._date_index = DateIndex(self.df["Date"])
+            return self._date_index
+
+    def value_counts(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct values of a column and how often they occur, most frequent
+        first. Counted once from the column's factorized codes (the existing
+        codes for category columns) and cached for this dataset version.
+        """
+        with self._lock:
+            cached = self._value_counts.get(name)
+        if cached is not None:
+            return cached
+
+        series = self.df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            uniques = np.asarray(series.cat.categories, dtype=object)
+        else:
+            codes, uniques = pd.factorize(series)
+            uniques = np.asarray(uniques, dtype=object)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        order = np.argsort(-counts, kind="stable")
+        order = order[counts[order] > 0]
+        cached = (uniques[order], counts[order])
+
+        with self._lock:
+            self._value_counts[name] = cached
+        return cached
+
+    def time_cube(self, name: str) -> TimeCube | None:
+        """
+        Day/month/quarter/year totals of a numeric column, rolled up once per
+        dataset version. None without a Date column.
+        """
+        with self._lock:
+            cached = self._time_cubes.get(name)
+        if cached is not None:
+            return cached
+
+        date_index = self.date_index
+        if date_index is None:
+            return None
+        values = pd.to_numeric(self.column(name), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        cached = TimeCube.from_index(date_index, values)
+
+        with self._lock:
+            self._time_cubes[name] = cached
+        return cached
+
+    def column(self, name: str) -> pd.Series | None:
+        """
+        Returns a column, computing a lazy derived metric on first use and
+        caching it on the in-memory frame for later requests.
+        """
+        df = self.df
+        if name in df.columns:
+            return df[name]
+        metric = METRICS_BY_NAME.get(name)
+        if metric is None or not set(metric.inputs).issubset(df.columns):
+            return None
+        with self._lock:
+            if name not in df.columns:
+                values = compute_metrics(df, [metric])[name]
+                df[name] = values
+                self.nbytes += values.nbytes
+        return df[name]
+
+
+class DatasetRegistry:
+    """
+    Holds one dataset per owner (a logged-in user or an anonymous session).
+    Every dataset is persisted to UPLOAD_DIR as a Feather segment listed in
+    the shared index. In-memory datasets are kept in LRU order; when their
+    total size exceeds the memory budget, or a dataset sits idle for too long,
+    it is dropped from memory and memory-mapped back on the next lookup.
+    Each lookup also checks the shared index, so datasets uploaded through
+    another worker, or before a restart, are picked up from disk the same way.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int = DATASET_MEMORY_BUDGET_MB * 1024 * 1024,
+        idle_seconds: float = DATASET_IDLE_SECONDS,
+    ):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_seconds = idle_seconds
+        self._datasets: "OrderedDict[str, Dataset]" = OrderedDict()
+        self._lock = threading.RLock()
+        # owner -> lock held while that owner's segment is read from disk
+        self._load_locks: dict[str, threading.Lock] = {}
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def get(self, owner: str) -> Dataset | None:
+        """
+        Returns the owner's dataset, memory-mapping it from disk if it is not
+        currently held in memory.
+        """
+        entry = storage.lookup_dataset(owner)
+        with self._lock:
+            dataset = self._datasets.get(owner)
+            if entry is None:
+                if dataset is not None and dataset.path is not None:
+                    # Dropped by another worker
+                    self._datasets.pop(owner, None)
+                    return None
+            elif dataset is not None and entry["version"] > dataset.version:
+                # Newer upload published by another worker (or before a restart)
+                dataset = None
+            if dataset is not None or entry is None:
+                return self._touch(owner, dataset)
+            load_lock = self._load_locks.setdefault(owner, threading.Lock())
+
+        # Reading the segment can take a while; only lookups of this owner wait for it
+        with load_lock:
+            with self._lock:
+                dataset = self._datasets.get(owner)
+            # Another request may have loaded it while this one waited
+            if dataset is None or dataset.version < entry["version"]:
+                dataset = self._load_persisted(owner)
+            with self._lock:
+                if self._load_locks.get(owner) is load_lock:
+                    del self._load_locks[owner]
+                if dataset is None:
+                    self._datasets.pop(owner, None)
+                    return None
+                current = self._datasets.get(owner)
+                # Never replace a newer version installed in the meantime
+                if current is not None and current.version >= dataset.version:
+                    dataset = current
+                return self._touch(owner, dataset)
+
+    def get_dataframe(self, owner: str) -> pd.DataFrame | None:
+        dataset = self.get(owner)
+        return dataset.df if dataset else None
+
+    def drop(self, owner: str):
+        with self._lock:
+            self._datasets.pop(owner, None)
+            storage.delete_dataset(owner)
+
+    def memory_in_use(self) -> int:
+        with self._lock:
+            return sum(d.nbytes for d in self._datasets.values() if d.in_memory)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "in_memory": sum(1 for d in self._datasets.values() if d.in_memory),
+                "memory_in_use_bytes": self.memory_in_use(),
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+    # -----------------------------
+    # Eviction & spilling
+    # -----------------------------
+    def _touch(self, owner: str, dataset: Dataset | None) -> Dataset | None:
+        # Caller holds self._lock
+        if dataset is None:
+            return None
+        self._datasets[owner] = dataset
+        dataset.last_access = time.monotonic()
+        self._datasets.move_to_end(owner)
+        self._enforce_budget(keep=owner)
+        return dataset
+
+    def _enforce_budget(self, keep: str | None = None):
+        now = time.monotonic()
+        for owner, dataset in list(self._datasets.items()):
+            if owner != keep and dataset.path and now - dataset.last_access > self.idle_seconds:
+                self._spill(owner)
+
+        in_use = self.memory_in_use()
+        # Oldest entries come first in the OrderedDict
+        for owner, dataset in list(self._datasets.items()):
+            if in_use <= self.memory_budget_bytes:
+                break
+            if owner == keep or dataset.path is None:
+                continue
+            self._spill(owner)
+            in_use -= dataset.nbytes
+
+    def _spill(self, owner: str):
+        # The Feather file written at upload time already holds the data; the
+        # next lookup maps it back as a new Dataset. The evicted object is left
+        # intact for requests still using it and freed once they are done.
+        print(f"Evicted dataset for {owner} from memory")
+        self._datasets.pop(owner, None)
+
+    def _load_persisted(self, owner: str) -> Dataset | None:
+        # A concurrent upload may replace the segment between lookup and load
+        for _ in range(3):
+            entry = storage.lookup_dataset(owner)
+            if entry is None:
+                return None
+            path = entry["path"]
+            loaded = storage.load_dataset(path)
+            if loaded is not None:
+                break
+        else:
+            return None
+        df, info = loaded
+        nbytes = int(df.memory_usage(deep=True).sum())
+        dataset = Dataset(
+            owner=owner, filename=info["filename"], df=df, nbytes=nbytes,
+            version=info["version"], path=path, memory_report=info["memory_report"],
+        )
+        dataset.prepare()
+        return dataset
+
+
+# Shared registry used by the API routes of this worker
+registry = DatasetRegistry()
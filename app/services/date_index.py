@@ -0,0 +1,147 @@
+# app/services/date_index.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+TIME_BUCKETS = ("day", "week", "month", "quarter", "year")
+AGGREGATIONS = ("sum", "mean", "min", "max", "count")
+LABEL_FORMATS = ("date", "epoch_ms")
+
+
+class DateIndex:
+    """
+    Sorted view of a dataset's Date column, built once per loaded dataset.
+    Uploads are stored in date order, so normally no sort is needed here and
+    the dates are a zero-copy view of the column. Bucket boundaries are cached
+    per bucket size, so a time-bucketed chart only has to reduce its values.
+
+    The chart axis encodings are prepared here too: epoch milliseconds per row,
+    and per-row codes into a small table of pre-formatted "YYYY-MM-DD" strings.
+    Chart requests slice these instead of parsing and formatting dates.
+    """
+
+    def __init__(self, dates: pd.Series):
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors="coerce")
+        if getattr(dates.dt, "tz", None) is not None:
+            dates = dates.dt.tz_localize(None)
+        values = dates.to_numpy()
+        valid = ~np.isnat(values)
+
+        # Axis encodings in row order
+        self.epoch_ms = values.astype("datetime64[ms]").astype(np.int64)
+        self.epoch_ms[~valid] = 0
+        unique_days, day_codes = np.unique(values.astype("datetime64[D]"), return_inverse=True)
+        self._day_codes = day_codes.astype(np.int32)
+        day_labels = pd.DatetimeIndex(unique_days).strftime("%Y-%m-%d")
+        self._day_labels = np.asarray([label if isinstance(label, str) else "" for label in day_labels], dtype=object)
+
+        if bool(valid.all()) and (len(values) < 2 or bool((values[1:] >= values[:-1]).all())):
+            self.order = None
+            self.dates = values
+        else:
+            # Rows with a missing date cannot be placed in a bucket
+            order = np.flatnonzero(valid)
+            order = order[np.argsort(values[order], kind="stable")]
+            self.order = order
+            self.dates = values[order]
+        self._buckets: dict[str, tuple[np.ndarray, list[str], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def row_labels(self, positions: np.ndarray | None = None, label_format: str = "date"):
+        """
+        Axis labels for the given row positions (all rows if None), either as
+        interned date strings or as an int64 array of epoch milliseconds.
+        The full epoch axis is returned without copying.
+        """
+        if label_format == "epoch_ms":
+            return self.epoch_ms if positions is None else self.epoch_ms[positions]
+        codes = self._day_codes if positions is None else self._day_codes[positions]
+        return self._day_labels.take(codes).tolist()
+
+    def take(self, values: np.ndarray) -> np.ndarray:
+        """
+        Returns values in date order (a no-op for date-sorted datasets).
+        """
+        return values if self.order is None else values[self.order]
+
+    def buckets(self, bucket: str) -> tuple[np.ndarray, list[str], np.ndarray]:
+        """
+        Returns (start offsets, labels, bucket start as epoch ms) of the buckets
+        the sorted dates fall into.
+        """
+        with self._lock:
+            cached = self._buckets.get(bucket)
+            if cached is None:
+                cached = self._buckets[bucket] = self._compute_buckets(bucket)
+            return cached
+
+    def _compute_buckets(self, bucket: str) -> tuple[np.ndarray, list[str], np.ndarray]:
+        if len(self.dates) == 0:
+            return np.empty(0, dtype=np.int64), [], np.empty(0, dtype=np.int64)
+
+        days = self.dates.astype("datetime64[D]")
+        if bucket == "day":
+            keys = days
+        elif bucket == "week":
+            # 1970-01-01 was a Thursday; weeks start on Monday
+            day_numbers = days.astype(np.int64)
+            keys = (day_numbers - (day_numbers + 3) % 7).astype("datetime64[D]")
+        elif bucket == "month":
+            keys = self.dates.astype("datetime64[M]")
+        elif bucket == "quarter":
+            months = self.dates.astype("datetime64[M]").astype(np.int64)
+            keys = (months - months % 3).astype("datetime64[M]")
+        elif bucket == "year":
+            keys = self.dates.astype("datetime64[Y]")
+        else:
+            raise ValueError(f"Unknown time bucket '{bucket}'")
+
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        bucket_keys = pd.DatetimeIndex(keys[starts])
+        if bucket == "month":
+            labels = bucket_keys.strftime("%Y-%m").tolist()
+        elif bucket == "quarter":
+            labels = [f"{ts.year}-Q{ts.quarter}" for ts in bucket_keys]
+        elif bucket == "year":
+            labels = bucket_keys.strftime("%Y").tolist()
+        else:
+            labels = bucket_keys.strftime("%Y-%m-%d").tolist()
+        epochs = keys[starts].astype("datetime64[ms]").astype(np.int64)
+        return starts, labels, epochs
+
+    def aggregate(self, values: np.ndarray, bucket: str, agg: str, label_format: str = "date") -> tuple[list[str] | np.ndarray, np.ndarray]:
+        """
+        Aggregates a numeric column (in original row order) per time bucket.
+        Missing values are ignored; buckets without any value report 0.
+        """
+        if agg not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{agg}'")
+        starts, labels, epochs = self.buckets(bucket)
+        if label_format == "epoch_ms":
+            labels = epochs
+        if len(starts) == 0:
+            return labels, np.empty(0)
+
+        values = self.take(np.asarray(values, dtype="float64"))
+        present = ~np.isnan(values)
+        counts = np.add.reduceat(present.astype(np.int64), starts)
+        if agg == "count":
+            return labels, counts.astype("float64")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if agg in ("sum", "mean"):
+                result = np.add.reduceat(np.where(present, values, 0.0), starts)
+                if agg == "mean":
+                    result = result / counts
+            elif agg == "min":
+                result = np.minimum.reduceat(np.where(present, values, np.inf), starts)
+            else:
+                result = np.maximum.reduceat(np.where(present, values, -np.inf), starts)
+        result[counts == 0] = 0
+        return labels, result
@@ -0,0 +1,63 @@
+# app/services/dtype_optimizer.py
+
+import os
+
+import pandas as pd
+
+# Text columns with at most this many distinct values become `category`
+# (the same threshold /api/summary uses to call a column categorical)
+CATEGORY_MAX_UNIQUE = int(os.environ.get("CATEGORY_MAX_UNIQUE", "50"))
+# Store the remaining text columns as Arrow-backed strings
+ARROW_STRINGS = os.environ.get("ARROW_STRINGS", "0") == "1"
+
+
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def optimize_column(series: pd.Series, category_max_unique: int = CATEGORY_MAX_UNIQUE, arrow_strings: bool = ARROW_STRINGS) -> pd.Series:
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast="unsigned" if series.min() >= 0 else "integer")
+    # Floats stay float64: pandas sums float32 in float32, so even values that
+    # convert exactly drift once totalled over millions of rows
+    if _is_text(series):
+        unique = series.nunique(dropna=True)
+        if unique <= category_max_unique and unique < len(series) / 2:
+            return series.astype("category")
+        if arrow_strings:
+            return series.astype("string[pyarrow]")
+    return series
+
+
+def optimize_dtypes(
+    df: pd.DataFrame,
+    category_max_unique: int = CATEGORY_MAX_UNIQUE,
+    arrow_strings: bool = ARROW_STRINGS,
+) -> tuple[pd.DataFrame, list[dict]]:
+    """
+    Shrinks a freshly ingested DataFrame: integers are downcast (sums still
+    accumulate in int64), low-cardinality text becomes `category` and,
+    optionally, other text becomes Arrow strings.
+    Returns the optimized frame and a per-column memory report.
+    """
+    report = []
+    before = df.memory_usage(deep=True, index=False)
+    for col in df.columns:
+        dtype_before = str(df[col].dtype)
+        try:
+            optimized = optimize_column(df[col], category_max_unique, arrow_strings)
+        except Exception as e:
+            print(f"Could not optimize column {col}: {e}")
+            optimized = df[col]
+        if optimized is not df[col]:
+            df[col] = optimized
+        report.append({
+            "column": col,
+            "dtype_before": dtype_before,
+            "dtype_after": str(df[col].dtype),
+            "bytes_before": int(before[col]),
+            "bytes_after": int(df[col].memory_usage(deep=True, index=False)),
+        })
+    return df, report
@@ -1,17 +1,32 @@
 
 # app/services/file_handler.py
 
+import os
+from typing import Callable, IO
+
 import pandas as pd
-from fastapi import UploadFile
-from io import BytesIO
 
-# This will hold our data in memory
-DATAFRAME: pd.DataFrame | None = None
+from app.services.dataset_registry import Dataset, registry
+from app.services.metrics import compute_metrics
+
+SUPPORTED_EXTENSIONS = (".csv", ".xls", ".xlsx")
+
+# When enabled, derived metric columns are computed on first use instead of at upload
+LAZY_METRICS = os.environ.get("LAZY_METRICS", "1") == "1"
+
+# Number of CSV rows parsed per batch when streaming an upload
+CSV_CHUNK_ROWS = 100_000
 
-def calculate_all_metrics(df: pd.DataFrame) -> pd.DataFrame:
+# progress(bytes_read, total_bytes, rows_parsed)
+ProgressCallback = Callable[[int, int, int], None]
+
+def calculate_all_metrics(df: pd.DataFrame, lazy: bool = False) -> pd.DataFrame:
     """
     Calculates all metrics if the required columns exist in the DataFrame.
-    This function is adapted from your metrics_calculator.py.
+    The formulas are declared in app.services.metrics (the same set that
+    metrics_calculator.py uses) and evaluated in a single vectorized pass.
+    With lazy=True only the Date column is prepared; the derived columns are
+    computed on demand by Dataset.column().
     """
     print("Calculating extended metrics...")
     
@@ -19,79 +34,112 @@ def calculate_all_metrics(df: pd.DataFrame) -> pd.DataFrame:
     if "Date" in df.columns:
         try:
             df["Date"] = pd.to_datetime(df["Date"])
+            # Store rows in date order so charts and time buckets need no per-request sort
+            if not df["Date"].is_monotonic_increasing:
+                df = df.sort_values("Date", kind="stable", ignore_index=True)
         except Exception as e:
             print(f"Could not parse Date column: {e}")
 
-    # Ratios & Percentages
-    if "Profit" in df.columns and "Sales" in df.columns:
-        df["Profit_Margin_%"] = (df["Profit"] / df["Sales"]) * 100
-    if "Sales" in df.columns and "Cost" in df.columns:
-        df["Gross_Margin_%"] = ((df["Sales"] - df["Cost"]) / df["Sales"]) * 100
-    if "Conversions" in df.columns and "Customers" in df.columns:
-        df["Conversion_Rate_%"] = (df["Conversions"] / df["Customers"]) * 100
-    if "Retained_Customers" in df.columns and "Customers" in df.columns:
-        df["Retention_Rate_%"] = (df["Retained_Customers"] / df["Customers"]) * 100
-        df["Churn_Rate_%"] = 100 - df["Retention_Rate_%"]
-    
-    # Operational Metrics
-    if "Resolution_Time_Hours" in df.columns and "Resolved_Tickets" in df.columns:
-        df["Avg_Resolution_Time"] = df["Resolution_Time_Hours"] / df["Resolved_Tickets"]
-    if "Employee_Worked_Hours" in df.columns and "Employee_Available_Hours" in df.columns:
-        df["Utilization_%"] = (df["Employee_Worked_Hours"] / df["Employee_Available_Hours"]) * 100
-        
-    # Customer & Marketing Metrics
-    if "Customer_Lifetime_Revenue" in df.columns:
-        df["CLV"] = df["Customer_Lifetime_Revenue"]
-    if "Customer_Acquisition_Cost" in df.columns:
-        df["CAC"] = df["Customer_Acquisition_Cost"]
-    if "Revenue" in df.columns and "Marketing_Spend" in df.columns:
-        df["ROI_%"] = ((df["Revenue"] - df["Marketing_Spend"]) / df["Marketing_Spend"]) * 100
-    
-    # Financial Metrics
-    if "Net_Profit" in df.columns and "Revenue" in df.columns:
-        df["Net_Profit_%"] = (df["Net_Profit"] / df["Revenue"]) * 100
-    if "Operating_Income" in df.columns and "Revenue" in df.columns:
-        df["Operating_Margin_%"] = (df["Operating_Income"] / df["Revenue"]) * 100
-
-    # Clean up any potential infinite values from division by zero
-    df.replace([float('inf'), float('-inf')], 0, inplace=True)
-    df.fillna(0, inplace=True)
+    # Only the derived columns are written; inf/NaN cleanup is done per column
+    if not lazy:
+        for name, values in compute_metrics(df).items():
+            df[name] = values
 
     print("Metrics calculation complete.")
     return df
 
-async def save_file(file: UploadFile):
+def _stream_size(stream: IO[bytes]) -> int:
     """
-    Reads an uploaded CSV/Excel file into a global pandas DataFrame
-    and then calculates all derived metrics.
+    Returns the total size of a seekable stream and rewinds it to the start.
     """
-    global DATAFRAME
-    
-    filename = file.filename
-    content = await file.read()
-    
-    try:
-        if filename.endswith(".csv"):
-            DATAFRAME = pd.read_csv(BytesIO(content))
-        elif filename.endswith((".xls", ".xlsx")):
-            DATAFRAME = pd.read_excel(BytesIO(content))
-        else:
-            return {"success": False, "message": "Unsupported file format"}
-
-        # <<< --- YAHAN PAR HUMNE METRICS CALCULATION KO CALL KIYA HAI --- >>>
-        DATAFRAME = calculate_all_metrics(DATAFRAME)
-
-        return {
-            "success": True,
-            "filename": filename,
-            "size": len(content),
-        }
-    except Exception as e:
-        DATAFRAME = None
-        return {"success": False, "message": f"Error parsing file: {str(e)}"}
-
-def get_dataframe() -> pd.DataFrame | None:
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def _print_progress(bytes_read: int, total_bytes: int, rows: int):
+    percent = (bytes_read / total_bytes * 100) if total_bytes else 100
+    print(f"Parsed {rows} rows ({percent:.0f}% of upload)")
+
+def _conflicting_columns(chunks: list[pd.DataFrame]) -> list[str]:
+    """
+    Columns that were parsed with incompatible types in different chunks,
+    e.g. numbers in the first chunk and text in a later one. int/float mixes
+    are fine, concat widens them to float.
+    """
+    conflicting = []
+    for col in chunks[0].columns:
+        kinds = {chunk[col].dtype.kind for chunk in chunks}
+        if len(kinds) > 1 and not kinds <= {"i", "u", "f"}:
+            conflicting.append(col)
+    return conflicting
+
+def read_csv_streaming(
+    stream: IO[bytes],
+    chunk_rows: int = CSV_CHUNK_ROWS,
+    progress: ProgressCallback | None = _print_progress,
+) -> pd.DataFrame:
+    """
+    Parses a CSV stream batch by batch instead of loading the raw bytes first.
+    Only the parsed batches are held in memory, so peak usage stays close to
+    the size of the final DataFrame rather than a multiple of the upload.
+    Each batch infers its own column types; a column whose type changes
+    between batches is read again as text, so every column ends up with a
+    single type like with a whole-file pd.read_csv.
+    """
+    total_bytes = _stream_size(stream)
+    chunks = []
+    rows = 0
+
+    # low_memory=False: one type per column within a batch
+    with pd.read_csv(stream, chunksize=chunk_rows, low_memory=False) as reader:
+        for chunk in reader:
+            chunks.append(chunk)
+            rows += len(chunk)
+            if progress:
+                progress(stream.tell(), total_bytes, rows)
+
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+
+    conflicting = _conflicting_columns(chunks)
+    if conflicting:
+        print(f"Column types differ between CSV batches, reading as text: {conflicting}")
+        stream.seek(0)
+        with pd.read_csv(stream, chunksize=chunk_rows, usecols=conflicting, dtype=str) as reader:
+            for chunk, text in zip(chunks, reader):
+                for col in conflicting:
+                    chunk[col] = text[col].to_numpy()
+
+    df = pd.concat(chunks, ignore_index=True)
+    chunks.clear()
+    return df
+
+def is_supported_file(filename: str) -> bool:
+    return filename.endswith(SUPPORTED_EXTENSIONS)
+
+def read_upload(stream: IO[bytes], filename: str, progress: ProgressCallback | None = _print_progress) -> pd.DataFrame:
+    """
+    Reads an uploaded CSV/Excel file into a pandas DataFrame.
+    CSV files are parsed in chunks; Excel files have to be read in one go.
+    This is blocking pandas work, so it runs inside the ingest job pool.
+    """
+    if filename.endswith(".csv"):
+        return read_csv_streaming(stream, progress=progress)
+    if filename.endswith((".xls", ".xlsx")):
+        return pd.read_excel(stream)
+    raise ValueError("Unsupported file format")
+
+def get_dataset(owner: str) -> Dataset | None:
+    """
+    Returns the owner's Dataset, which also resolves lazy derived columns.
+    """
+    return registry.get(owner)
+
+def get_dataframe(owner: str) -> pd.DataFrame | None:
     """
-    Returns the currently loaded DataFrame.
+    Returns the DataFrame currently loaded for the given owner.
     """
-    return DATAFRAME
\ No newline at end of file
+    return registry.get_dataframe(owner)
@@ -0,0 +1,115 @@
+# app/services/google_certs.py
+
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable
+
+import httpx
+from google.auth import jwt as google_jwt
+from jose import jwt as jose_jwt
+
+# Google's ID-token signing certificates (PEM, keyed by "kid")
+GOOGLE_CERTS_URL = os.environ.get("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+# Used when the certificate response carries no max-age
+GOOGLE_CERTS_DEFAULT_TTL_SECONDS = int(os.environ.get("GOOGLE_CERTS_DEFAULT_TTL_SECONDS", "300"))
+GOOGLE_CERTS_TIMEOUT_SECONDS = float(os.environ.get("GOOGLE_CERTS_TIMEOUT_SECONDS", "5"))
+# Unknown key ids refetch at most this often, so bogus tokens cannot hammer Google
+GOOGLE_CERTS_MIN_REFRESH_SECONDS = float(os.environ.get("GOOGLE_CERTS_MIN_REFRESH_SECONDS", "60"))
+# Tolerated clock difference when checking iat/exp
+GOOGLE_CLOCK_SKEW_SECONDS = int(os.environ.get("GOOGLE_CLOCK_SKEW_SECONDS", "10"))
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# A fetcher returns (certs, seconds they stay fresh)
+CertFetcher = Callable[[], Awaitable[tuple[dict, float]]]
+
+
+def max_age_seconds(headers) -> float | None:
+    """Freshness lifetime from Cache-Control max-age, less the Age already spent in caches."""
+    match = re.search(r"max-age=(\d+)", headers.get("cache-control", ""))
+    if not match:
+        return None
+    age = headers.get("age", "0")
+    return max(0, int(match.group(1)) - (int(age) if age.isdigit() else 0))
+
+
+async def fetch_google_certs() -> tuple[dict, float]:
+    async with httpx.AsyncClient(timeout=GOOGLE_CERTS_TIMEOUT_SECONDS) as client:
+        response = await client.get(GOOGLE_CERTS_URL)
+        response.raise_for_status()
+    ttl = max_age_seconds(response.headers)
+    return response.json(), GOOGLE_CERTS_DEFAULT_TTL_SECONDS if ttl is None else ttl
+
+
+class GoogleCertCache:
+    """
+    Keeps Google's signing certificates in memory for as long as their
+    Cache-Control max-age allows, so an ID token is verified locally without
+    a network round trip. One refresh runs at a time, a token signed with an
+    unknown key triggers an early refresh (key rotation), and stale
+    certificates are kept if a refresh fails. The fetcher is injectable so
+    tests can run offline.
+    """
+
+    def __init__(self, fetcher: CertFetcher = fetch_google_certs):
+        self.fetcher = fetcher
+        self._certs: dict = {}
+        self._expires = 0.0
+        self._fetched_at = float("-inf")
+        self._lock: asyncio.Lock | None = None
+        self.fetches = 0
+
+    async def get_certs(self, force: bool = False) -> dict:
+        now = time.monotonic()
+        if self._certs and now < self._expires:
+            if not force or now - self._fetched_at < GOOGLE_CERTS_MIN_REFRESH_SECONDS:
+                return self._certs
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        stamp = self._expires
+        async with self._lock:
+            # Someone else refreshed while we waited
+            if self._certs and self._expires != stamp:
+                return self._certs
+            try:
+                certs, ttl = await self.fetcher()
+            except Exception as e:
+                if not self._certs:
+                    raise
+                print(f"Could not refresh Google certificates, keeping the cached ones: {e!r}")
+                return self._certs
+            self.fetches += 1
+            self._certs = certs
+            self._fetched_at = time.monotonic()
+            self._expires = self._fetched_at + ttl
+            return self._certs
+
+    async def verify(self, token: str, audience: str | None) -> dict:
+        """
+        Verifies a Google ID token's signature, expiry, audience and issuer.
+        Raises ValueError when the token is not valid.
+        """
+        try:
+            kid = jose_jwt.get_unverified_header(token).get("kid")
+        except Exception as e:
+            raise ValueError(f"Malformed token: {e}") from e
+
+        certs = await self.get_certs()
+        if kid not in certs:
+            certs = await self.get_certs(force=True)
+
+        id_info = google_jwt.decode(token, certs=certs, audience=audience, clock_skew_in_seconds=GOOGLE_CLOCK_SKEW_SECONDS)
+        if id_info.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {id_info.get('iss')}")
+        return id_info
+
+    def clear(self):
+        self._certs = {}
+        self._expires = 0.0
+        self._fetched_at = float("-inf")
+
+
+# Shared by the Google sign-in callback of this worker
+google_certs = GoogleCertCache()
@@ -0,0 +1,43 @@
+# app/services/http_cache.py
+
+import hashlib
+from typing import Callable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+
+def make_etag(*parts) -> str:
+    """
+    Builds a weak ETag from anything that identifies a response's content,
+    e.g. (dataset id, dataset version, endpoint, parameters).
+    """
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def conditional_response(request: Request, etag: str, build: Callable[[], Response], vary: str | None = None) -> Response:
+    """
+    Answers 304 Not Modified when the client already holds this ETag;
+    otherwise builds the response and tags it. Clients must revalidate on
+    every use, so a new upload is picked up immediately.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if vary:
+        headers["Vary"] = vary
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response = build()
+    response.headers.update(headers)
+    return response
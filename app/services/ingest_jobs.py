@@ -0,0 +1,224 @@
+# app/services/ingest_jobs.py
+
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import IO
+
+from app.services import storage
+from app.services.dtype_optimizer import optimize_dtypes
+from app.services.file_handler import LAZY_METRICS, calculate_all_metrics, read_upload
+
+# Parsing and metric computation run in these worker processes, never on the event loop
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+# Finished job records older than this are cleaned up
+JOB_RETENTION_SECONDS = int(os.environ.get("INGEST_JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+# Job records live next to the datasets so every worker process can answer status requests
+JOBS_DIR = os.path.join(storage.UPLOAD_DIR, "jobs")
+INCOMING_DIR = os.path.join(storage.UPLOAD_DIR, "incoming")
+
+COPY_BUFFER_BYTES = 1024 * 1024
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # "spawn" keeps the children free of the server's threads and sockets
+            _pool = ProcessPoolExecutor(max_workers=INGEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """
+    Drops a pool whose worker died (e.g. OOM-killed), so the next job gets a
+    fresh one instead of BrokenProcessPool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# =================================================================
+#  JOB RECORDS
+# =================================================================
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _write_job(job: dict):
+    job["updated_at"] = time.time()
+    path = _job_path(job["job_id"])
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, path)
+
+
+def get_job(job_id: str) -> dict | None:
+    # Job ids are generated by us; anything else never names a file
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(_job_path(job_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _prune_old_jobs():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for name in os.listdir(JOBS_DIR):
+        path = os.path.join(JOBS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# =================================================================
+#  SUBMISSION (called from the API, only does file I/O)
+# =================================================================
+
+def stage_upload(stream: IO[bytes], filename: str) -> tuple[str, str, int]:
+    """
+    Copies the upload spool to INCOMING_DIR so the job can outlive the request.
+    Blocking file I/O: call it through a thread pool. Returns (job_id, path, size).
+    """
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    extension = os.path.splitext(filename)[1]
+    raw_path = os.path.join(INCOMING_DIR, f"{job_id}{extension}")
+    stream.seek(0)
+    with open(raw_path, "wb") as out:
+        shutil.copyfileobj(stream, out, COPY_BUFFER_BYTES)
+    return job_id, raw_path, os.path.getsize(raw_path)
+
+
+def submit_ingest(job_id: str, owner: str, raw_path: str, filename: str, size: int) -> dict:
+    """
+    Records a queued job and hands it to the process pool.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    _prune_old_jobs()
+    job = {
+        "job_id": job_id,
+        "dataset_id": storage.dataset_id(owner),
+        "filename": filename,
+        "size": size,
+        "status": "queued",
+        "progress": 0.0,
+        "rows": 0,
+        "message": "",
+        "dataset_version": None,
+        "created_at": time.time(),
+    }
+    _write_job(job)
+    pool = _get_pool()
+    try:
+        future = pool.submit(run_ingest_job, job, owner, raw_path)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        pool = _get_pool()
+        future = pool.submit(run_ingest_job, job, owner, raw_path)
+    future.add_done_callback(lambda f: _on_job_finished(f, pool, job["job_id"], raw_path))
+    return job
+
+
+def _on_job_finished(future: Future, pool: ProcessPoolExecutor, job_id: str, raw_path: str):
+    """
+    run_ingest_job records its own errors; the future only fails when the
+    worker process died, so the job record is closed here instead.
+    """
+    if future.cancelled():
+        error = "Ingest was cancelled (server shutting down)"
+    else:
+        exception = future.exception()
+        if exception is None:
+            return
+        if isinstance(exception, BrokenProcessPool):
+            _discard_pool(pool)
+        error = f"Ingest worker crashed: {exception!r}"
+
+    print(f"--- INGEST ERROR ({job_id}): {error} ---")
+    job = get_job(job_id)
+    if job is not None and job["status"] not in ("done", "error"):
+        job["status"] = "error"
+        job["message"] = error
+        _write_job(job)
+    if os.path.exists(raw_path):
+        os.remove(raw_path)
+
+
+# =================================================================
+#  JOB BODY (runs inside a pool process)
+# =================================================================
+
+def run_ingest_job(job: dict, owner: str, raw_path: str):
+    """
+    Parses the staged file, calculates all derived metrics and publishes the
+    result to the shared dataset store. Parsing reports progress from 0 to 90%,
+    the remaining steps are metrics, dtype optimization and saving.
+    """
+    def report_parse_progress(bytes_read: int, total_bytes: int, rows: int):
+        job["progress"] = round(0.9 * bytes_read / total_bytes, 3) if total_bytes else 0.9
+        job["rows"] = rows
+        _write_job(job)
+
+    try:
+        job["status"] = "parsing"
+        _write_job(job)
+        with open(raw_path, "rb") as stream:
+            df = read_upload(stream, job["filename"], progress=report_parse_progress)
+        job["rows"] = len(df)
+
+        job["status"] = "metrics"
+        job["progress"] = 0.9
+        _write_job(job)
+        df = calculate_all_metrics(df, lazy=LAZY_METRICS)
+
+        job["status"] = "optimizing"
+        job["progress"] = 0.93
+        _write_job(job)
+        df, memory_report = optimize_dtypes(df)
+
+        job["status"] = "saving"
+        job["progress"] = 0.95
+        _write_job(job)
+        version = storage.new_version()
+        storage.save_dataset(owner, df, job["filename"], version, memory_report)
+
+        job["status"] = "done"
+        job["progress"] = 1.0
+        job["dataset_version"] = version
+        job["message"] = "File uploaded and dataframe loaded ✅"
+    except Exception as e:
+        print(f"--- INGEST ERROR ({job['job_id']}): {e} ---")
+        job["status"] = "error"
+        job["message"] = f"Error parsing file: {str(e)}"
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+        _write_job(job)
@@ -0,0 +1,230 @@
+# app/services/large_data.py
+
+import os
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+# Above this many rows, charts switch to the aggregate drawings below
+LARGE_DATA_ROWS = int(os.environ.get("LARGE_DATA_ROWS", "50000"))
+# Rows kept where a representative sample is enough (pairplot, outlier markers)
+SAMPLE_ROWS = int(os.environ.get("LARGE_DATA_SAMPLE_ROWS", "20000"))
+HIST_BINS = 50
+HEXBIN_GRIDSIZE = 60
+MAX_FLIERS = 200
+MAX_PIE_SLICES = 12
+
+
+def is_large(n_rows: int, threshold: int = LARGE_DATA_ROWS) -> bool:
+    return n_rows > threshold
+
+
+def finite_values(values) -> np.ndarray:
+    values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+# =================================================================
+#  SAMPLING
+# =================================================================
+
+def reservoir_sample(chunks: Iterable[pd.DataFrame], k: int = SAMPLE_ROWS, seed: int = 0) -> pd.DataFrame:
+    """
+    Uniform sample of k rows from a stream of DataFrame chunks (Algorithm R,
+    vectorized per chunk), so a file never has to be held in memory whole.
+    Rows keep their original order.
+    """
+    rng = np.random.default_rng(seed)
+    sample: pd.DataFrame | None = None
+    positions = np.empty(0, dtype=np.int64)  # stream position of each sampled row
+    seen = 0
+
+    for chunk in chunks:
+        t = np.arange(seen, seen + len(chunk))
+        seen += len(chunk)
+
+        # The first k rows fill the reservoir
+        fill = np.flatnonzero(t < k)
+        if len(fill):
+            part = chunk.iloc[fill]
+            sample = part if sample is None else pd.concat([sample, part], ignore_index=True)
+            positions = np.concatenate([positions, t[fill]])
+
+        # Row t replaces slot j ~ U[0, t] when j < k; a later row wins a slot picked twice
+        rest = np.flatnonzero(t >= k)
+        if len(rest):
+            j = rng.integers(0, t[rest] + 1)
+            rows, slots = rest[j < k], j[j < k]
+            last = len(slots) - 1 - np.unique(slots[::-1], return_index=True)[1]
+            rows, slots = rows[last], slots[last]
+            keep = np.ones(len(sample), dtype=bool)
+            keep[slots] = False
+            sample = pd.concat([sample[keep], chunk.iloc[rows]], ignore_index=True)
+            positions = np.concatenate([positions[keep], t[rows]])
+
+    if sample is None:
+        return pd.DataFrame()
+    return sample.iloc[np.argsort(positions, kind="stable")].reset_index(drop=True)
+
+
+def sample_frame(df: pd.DataFrame, k: int = SAMPLE_ROWS, seed: int = 0) -> pd.DataFrame:
+    if len(df) <= k:
+        return df
+    return reservoir_sample([df], k, seed)
+
+
+# =================================================================
+#  PRECOMPUTED SUMMARIES (one pass over the data, constant-size output)
+# =================================================================
+
+def binned_histogram(values, bins: int = HIST_BINS) -> tuple[np.ndarray, np.ndarray]:
+    values = finite_values(values)
+    if len(values) == 0:
+        return np.zeros(0), np.zeros(1)
+    return np.histogram(values, bins=bins)
+
+
+def smoothed_density(counts: np.ndarray, edges: np.ndarray, bandwidth_bins: float = 1.5) -> tuple[np.ndarray, np.ndarray]:
+    """
+    KDE-like curve from histogram counts (Gaussian smoothing over bins), on
+    the count scale. Costs O(bins), not O(rows).
+    """
+    centers = (edges[:-1] + edges[1:]) / 2
+    radius = max(1, int(np.ceil(3 * bandwidth_bins)))
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / bandwidth_bins) ** 2)
+    kernel /= kernel.sum()
+    return centers, np.convolve(counts, kernel, mode="same")
+
+
+def box_stats(values, label: str = "", max_fliers: int = MAX_FLIERS, seed: int = 0) -> dict:
+    """
+    Box-plot statistics in the format of matplotlib's Axes.bxp: quartiles,
+    1.5 IQR whiskers and a sample of the outliers.
+    """
+    values = finite_values(values)
+    if len(values) == 0:
+        return {"label": label, "q1": np.nan, "med": np.nan, "q3": np.nan, "whislo": np.nan, "whishi": np.nan, "fliers": np.zeros(0), "mean": np.nan}
+    q1, med, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    fliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    if len(fliers) > max_fliers:
+        fliers = np.random.default_rng(seed).choice(fliers, max_fliers, replace=False)
+    return {
+        "label": label, "q1": q1, "med": med, "q3": q3, "mean": values.mean(),
+        "whislo": inside.min() if len(inside) else q1, "whishi": inside.max() if len(inside) else q3,
+        "fliers": fliers,
+    }
+
+
+def violin_stats(values, points: int = 100, bins: int = 2 * HIST_BINS) -> dict:
+    """
+    Violin statistics in the format of matplotlib's Axes.violin, with the
+    density taken from a smoothed histogram instead of a per-point KDE.
+    """
+    values = finite_values(values)
+    counts, edges = binned_histogram(values, bins)
+    centers, density = smoothed_density(counts.astype("float64"), edges)
+    coords = np.linspace(edges[0], edges[-1], points)
+    vals = np.interp(coords, centers, density) if len(centers) else np.zeros(points)
+    return {
+        "coords": coords, "vals": vals,
+        "mean": values.mean() if len(values) else np.nan, "median": np.median(values) if len(values) else np.nan,
+        "min": edges[0], "max": edges[-1],
+    }
+
+
+def bucket_slices(values, labels, max_slices: int = MAX_PIE_SLICES) -> tuple[list[str], np.ndarray]:
+    """
+    Pie slices for consecutive row ranges: the rows are split into max_slices
+    equal runs and each slice is the run's total, labelled "first-last".
+    Missing and negative values count as 0.
+    """
+    values = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    values = np.where(np.isfinite(values) & (values > 0), values, 0.0)
+    labels = np.asarray(labels, dtype=object)
+    if len(values) == 0:
+        return [], values
+    starts = np.unique(np.linspace(0, len(values), max_slices, endpoint=False).astype(np.int64))
+    ends = np.append(starts[1:], len(values)) - 1
+    return [f"{labels[start]}–{labels[end]}" for start, end in zip(starts, ends)], np.add.reduceat(values, starts)
+
+
+def linear_fit(x, y) -> tuple[float, float] | None:
+    """Closed-form least-squares line (slope, intercept); no bootstrap."""
+    x = pd.to_numeric(pd.Series(x), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    y = pd.to_numeric(pd.Series(y), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+    if len(x) < 2:
+        return None
+    x_mean, y_mean = x.mean(), y.mean()
+    var = np.dot(x - x_mean, x - x_mean)
+    if var == 0:
+        return None
+    slope = np.dot(x - x_mean, y - y_mean) / var
+    return slope, y_mean - slope * x_mean
+
+
+# =================================================================
+#  DRAWING (constant cost in the number of rows once summarized)
+# =================================================================
+
+def draw_histogram(ax, values, bins: int = HIST_BINS, color: str = "skyblue", density_curve: bool = True):
+    counts, edges = binned_histogram(values, bins)
+    ax.stairs(counts, edges, fill=True, color=color, alpha=0.8)
+    if density_curve and len(counts):
+        centers, smooth = smoothed_density(counts.astype("float64"), edges)
+        ax.plot(centers, smooth, color="steelblue")
+
+
+def draw_box(ax, values, color: str = "lightgreen", label: str = ""):
+    stats = box_stats(values, label)
+    ax.bxp([stats], orientation="horizontal", patch_artist=True, showfliers=True,
+           boxprops={"facecolor": color}, flierprops={"marker": "d", "markersize": 3})
+    ax.set_yticks([])
+
+
+def draw_violin(ax, values, color: str = "lightblue"):
+    parts = ax.violin([violin_stats(values)], orientation="horizontal", showmedians=True)
+    for body in parts["bodies"]:
+        body.set_facecolor(color)
+        body.set_alpha(0.8)
+    ax.set_yticks([])
+
+
+def draw_density_scatter(ax, x, y, gridsize: int = HEXBIN_GRIDSIZE):
+    """Hexbin density instead of one marker per row (log-scaled counts)."""
+    x = pd.to_numeric(pd.Series(x), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    y = pd.to_numeric(pd.Series(y), errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    ok = np.isfinite(x) & np.isfinite(y)
+    return ax.hexbin(x[ok], y[ok], gridsize=gridsize, bins="log", mincnt=1, cmap="viridis")
+
+
+def draw_regression_line(ax, x, y, color: str = "red"):
+    fit = linear_fit(x, y)
+    if fit is None:
+        return
+    slope, intercept = fit
+    lo, hi = np.nanmin(pd.to_numeric(pd.Series(x), errors="coerce")), np.nanmax(pd.to_numeric(pd.Series(x), errors="coerce"))
+    ax.plot([lo, hi], [slope * lo + intercept, slope * hi + intercept], color=color)
+
+
+def draw_pairgrid(fig, data: pd.DataFrame, bins: int = HIST_BINS, gridsize: int = HEXBIN_GRIDSIZE // 2):
+    """Pairplot equivalent: binned histograms on the diagonal, hexbin density elsewhere."""
+    cols = data.columns.tolist()
+    n = len(cols)
+    axes = fig.subplots(n, n, squeeze=False)
+    for i, y_col in enumerate(cols):
+        for j, x_col in enumerate(cols):
+            ax = axes[i][j]
+            if i == j:
+                draw_histogram(ax, data[x_col], bins, density_curve=False)
+            else:
+                draw_density_scatter(ax, data[x_col], data[y_col], gridsize)
+            if i == n - 1:
+                ax.set_xlabel(x_col)
+            if j == 0:
+                ax.set_ylabel(y_col)
+    return axes
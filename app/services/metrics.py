@@ -0,0 +1,88 @@
+# app/services/metrics.py
+
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Metric:
+    """
+    A derived column: its name, the raw columns it needs and a vectorized
+    formula that receives those columns as float64 arrays, in order.
+    """
+    name: str
+    inputs: tuple[str, ...]
+    formula: Callable[..., np.ndarray]
+    group: str
+
+
+def _ratio_pct(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return numerator / denominator * 100
+
+
+# =================================================================
+#  METRIC REGISTRY
+# =================================================================
+METRICS: list[Metric] = [
+    # Ratios & Percentages
+    Metric("Profit_Margin_%", ("Profit", "Sales"), _ratio_pct, "ratios"),
+    Metric("Gross_Margin_%", ("Sales", "Cost"), lambda sales, cost: (sales - cost) / sales * 100, "ratios"),
+    Metric("Conversion_Rate_%", ("Conversions", "Customers"), _ratio_pct, "ratios"),
+    Metric("Retention_Rate_%", ("Retained_Customers", "Customers"), _ratio_pct, "ratios"),
+    Metric("Churn_Rate_%", ("Retained_Customers", "Customers"), lambda retained, customers: 100 - retained / customers * 100, "ratios"),
+    Metric("Contribution_%", ("Sales",), lambda sales: sales / np.nansum(sales) * 100, "ratios"),
+
+    # Operational Metrics
+    Metric("Avg_Resolution_Time", ("Resolution_Time_Hours", "Resolved_Tickets"), np.divide, "operational"),
+    Metric("Utilization_%", ("Employee_Worked_Hours", "Employee_Available_Hours"), _ratio_pct, "operational"),
+    Metric("Stock_Turnover", ("Stock_Sold", "Stock_Avg"), np.divide, "operational"),
+    Metric("On_Time_Delivery_%", ("On_Time_Delivery", "Total_Delivery"), _ratio_pct, "operational"),
+
+    # Customer & Marketing Metrics
+    Metric("CLV", ("Customer_Lifetime_Revenue",), np.copy, "customer"),
+    Metric("CAC", ("Customer_Acquisition_Cost",), np.copy, "customer"),
+    Metric("ROI_%", ("Revenue", "Marketing_Spend"), lambda revenue, spend: (revenue - spend) / spend * 100, "customer"),
+    Metric("Lead_Conversion_Rate_%", ("Converted_Leads", "Leads"), _ratio_pct, "customer"),
+
+    # Financial Metrics
+    Metric("Net_Profit_%", ("Net_Profit", "Revenue"), _ratio_pct, "financial"),
+    Metric("Operating_Margin_%", ("Operating_Income", "Revenue"), _ratio_pct, "financial"),
+    Metric("Working_Capital", ("Working_Capital_CurrentAssets", "Working_Capital_CurrentLiabilities"), np.subtract, "financial"),
+    Metric("Debt_to_Equity", ("Total_Debt", "Total_Equity"), np.divide, "financial"),
+]
+
+METRICS_BY_NAME: dict[str, Metric] = {metric.name: metric for metric in METRICS}
+
+
+def applicable_metrics(columns) -> list[Metric]:
+    """
+    Returns the metrics whose input columns are all present.
+    """
+    available = set(columns)
+    return [metric for metric in METRICS if available.issuperset(metric.inputs)]
+
+
+def compute_metrics(df: pd.DataFrame, metrics: list[Metric] | None = None) -> dict[str, np.ndarray]:
+    """
+    Evaluates the given (default: all applicable) metrics against df in one pass.
+    Each input column is converted to float64 once and shared between the
+    formulas that use it. Division by zero and missing inputs are cleaned up
+    per derived column (inf/NaN -> 0); the raw columns are never modified.
+    """
+    if metrics is None:
+        metrics = applicable_metrics(df.columns)
+
+    inputs: dict[str, np.ndarray] = {}
+    results: dict[str, np.ndarray] = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for metric in metrics:
+            for col in metric.inputs:
+                if col not in inputs:
+                    inputs[col] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            values = np.asarray(metric.formula(*(inputs[col] for col in metric.inputs)), dtype="float64")
+            values[~np.isfinite(values)] = 0
+            results[metric.name] = values
+    return results
@@ -0,0 +1,120 @@
+# app/services/result_cache.py
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+import numpy as np
+
+from app.services.dataset_registry import Dataset
+
+# Maximum number of cached endpoint results per worker
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "512"))
+# Memory budget of the cached results per worker (full series can be large)
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def normalize_params(params: dict) -> tuple:
+    """
+    Turns request parameters into a hashable key that ignores ordering and
+    unset (None) values, so equivalent requests share one cache entry.
+    """
+    return tuple(sorted((k, v) for k, v in params.items() if v is not None))
+
+
+def result_nbytes(value: Any) -> int:
+    """Approximate memory held by a cached result (arrays, lists, dicts)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_nbytes(k) + result_nbytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    LRU memo of endpoint results keyed by (dataset id, dataset version,
+    endpoint, normalized parameters). A new upload gets a new version, so
+    its requests never hit stale entries; the entries of older versions are
+    dropped as soon as the new version is seen. Bounded by entry count and by
+    the bytes of the cached arrays; a result bigger than the whole budget is
+    returned but not kept.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, nbytes)
+        self._entries: "OrderedDict[tuple, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._latest_version: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, dataset: Dataset, endpoint: str, params: dict, compute: Callable[[], Any]) -> Any:
+        key = (dataset.dataset_id, dataset.version, endpoint, normalize_params(params))
+        with self._lock:
+            self._invalidate_older(dataset.dataset_id, dataset.version)
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+
+        # Computed outside the lock; two concurrent misses just compute twice
+        value = compute()
+        nbytes = result_nbytes(value)
+
+        with self._lock:
+            if self._latest_version.get(dataset.dataset_id) == dataset.version and nbytes <= self.max_bytes:
+                self._remove(key)
+                self._entries[key] = (value, nbytes)
+                self._bytes += nbytes
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_bytes
+                    self.evictions += 1
+        return value
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _invalidate_older(self, ds_id: str, version: int):
+        latest = self._latest_version.get(ds_id)
+        if latest is not None and latest >= version:
+            return
+        self._latest_version[ds_id] = version
+        if latest is not None:
+            for key in [k for k in self._entries if k[0] == ds_id and k[1] != version]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Shared cache used by the API routes of this worker
+result_cache = ResultCache()
@@ -0,0 +1,58 @@
+# app/services/serialization.py
+
+from typing import Any
+
+import numpy as np
+import orjson
+import pyarrow as pa
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# Clients that send this Accept header get the series as an Arrow IPC stream
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. NumPy arrays are serialized straight
+    from their buffers, so handlers don't have to build Python lists first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def wants_arrow(request: Request) -> bool:
+    return ARROW_STREAM_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _to_arrow_array(values) -> pa.Array:
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed-type labels (e.g. value_counts of an object column)
+        return pa.array([str(v) for v in values])
+
+
+def arrow_response(columns: dict[str, Any], metadata: dict[str, str] | None = None, status_code: int = 200) -> Response:
+    """
+    Encodes equally long columns as one Arrow IPC stream with typed,
+    little-endian buffers (float64 values stay float64 on the wire).
+    """
+    table = pa.table({name: _to_arrow_array(values) for name, values in columns.items()})
+    if metadata:
+        table = table.replace_schema_metadata(metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE, status_code=status_code)
+
+
+def series_response(request: Request, labels, values: np.ndarray) -> Response:
+    """
+    Returns a {labels, values} series in the format the client asked for:
+    Arrow IPC when it accepts ARROW_STREAM_MEDIA_TYPE, fast JSON otherwise.
+    """
+    if wants_arrow(request):
+        return arrow_response({"labels": labels, "values": values}, metadata={"status": "success"})
+    return FastJSONResponse({"status": "success", "labels": labels, "values": values})
@@ -0,0 +1,224 @@
+# app/services/storage.py
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Parsed & enriched datasets are persisted here as Feather segments.
+# Every worker process on the host reads the same files, so an upload handled
+# by one gunicorn worker is visible to all of them.
+UPLOAD_DIR = "uploads_files"
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+INDEX_PATH = os.path.join(UPLOAD_DIR, "index.json")
+
+_META_FILENAME = b"morph.filename"
+_META_VERSION = b"morph.version"
+_META_MEMORY_REPORT = b"morph.memory_report"
+
+
+def new_version() -> int:
+    """
+    Returns a version stamp for a freshly uploaded dataset.
+    Nanosecond timestamps stay unique and increasing across restarts and workers.
+    """
+    return time.time_ns()
+
+
+def dataset_id(owner: str) -> str:
+    """
+    Owners are hashed so e-mail addresses never end up in file names.
+    """
+    return hashlib.sha256(owner.encode("utf-8")).hexdigest()[:32]
+
+
+def segment_path(ds_id: str, version: int) -> str:
+    return os.path.join(UPLOAD_DIR, f"{ds_id}-{version}.feather")
+
+
+# =================================================================
+#  SHARED INDEX (dataset id -> current segment)
+# =================================================================
+
+class SharedIndex:
+    """
+    A small JSON file mapping dataset ids to their current segment.
+    Writers serialize on an flock and atomically replace the file; readers
+    only re-parse it when it changes on disk, so a lookup is usually one stat().
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._lock_path = f"{path}.lock"
+        self._cache: dict = {}
+        self._cache_stamp: tuple | None = None
+        self._cache_lock = threading.Lock()
+
+    @contextmanager
+    def _exclusive(self):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_file(self, entries: dict):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def entries(self) -> dict:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        # Every write replaces the file, so the inode changes even when two
+        # writes land within the same mtime tick
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._cache_lock:
+            if stamp != self._cache_stamp:
+                self._cache = self._read_file()
+                self._cache_stamp = stamp
+            return self._cache
+
+    def lookup(self, ds_id: str) -> dict | None:
+        return self.entries().get(ds_id)
+
+    def publish(self, ds_id: str, entry: dict) -> dict | None:
+        """
+        Points a dataset id at a new segment and returns the entry that is no
+        longer referenced: the one it replaced, or the new entry itself if a
+        newer version was published concurrently.
+        """
+        with self._exclusive():
+            entries = self._read_file()
+            previous = entries.get(ds_id)
+            if previous and previous["version"] > entry["version"]:
+                return entry
+            entries[ds_id] = entry
+            self._write_file(entries)
+            return previous
+
+    def remove(self, ds_id: str) -> dict | None:
+        with self._exclusive():
+            entries = self._read_file()
+            previous = entries.pop(ds_id, None)
+            if previous is not None:
+                self._write_file(entries)
+            return previous
+
+
+index = SharedIndex()
+
+
+# =================================================================
+#  SEGMENTS
+# =================================================================
+
+def _remove_segment(entry: dict | None):
+    # Workers that still have the old segment mapped keep their view of it
+    if entry and os.path.exists(entry["path"]):
+        os.remove(entry["path"])
+
+
+def _text_column(series: pd.Series) -> pd.Series:
+    values = series.astype(object)
+    return values.astype(str).where(values.notna(), None)
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a frame to Arrow. Object (or category) columns that hold a mix of
+    types Arrow cannot store in one column, like numbers next to text, are
+    written as text instead of failing the whole upload.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        mixed = []
+        for col in df.columns:
+            series = df[col]
+            values = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series
+            if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) not in ("string", "empty"):
+                mixed.append(col)
+        if not mixed:
+            raise
+        print(f"Storing mixed-type columns as text ({e}): {mixed}")
+        df = df.assign(**{col: _text_column(df[col]) for col in mixed})
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def save_dataset(owner: str, df: pd.DataFrame, filename: str, version: int, memory_report: list[dict] | None = None) -> str:
+    """
+    Writes the DataFrame as an uncompressed Feather (Arrow IPC) segment so it
+    can be memory-mapped instead of parsed, then publishes it in the shared
+    index. The write goes to a temporary file first and is then renamed, so
+    readers never see a half-written segment.
+    """
+    ds_id = dataset_id(owner)
+    path = segment_path(ds_id, version)
+    table = to_arrow_table(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_META_FILENAME] = filename.encode("utf-8")
+    metadata[_META_VERSION] = str(version).encode("utf-8")
+    if memory_report is not None:
+        metadata[_META_MEMORY_REPORT] = json.dumps(memory_report).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+    _remove_segment(index.publish(ds_id, {"path": path, "version": version, "filename": filename}))
+    return path
+
+
+def lookup_dataset(owner: str) -> dict | None:
+    """
+    Returns the index entry ({path, version, filename}) of the owner's
+    current segment, or None if the owner has no persisted dataset.
+    """
+    return index.lookup(dataset_id(owner))
+
+
+def load_dataset(path: str) -> tuple[pd.DataFrame, dict] | None:
+    """
+    Memory-maps a persisted segment and returns (df, info), where info holds
+    the original filename, the version and the ingest memory report.
+    Numeric columns are backed by the mapped file, which the OS page cache
+    shares between all workers reading the same segment.
+    """
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except FileNotFoundError:
+        # Replaced by a newer upload and removed after the index was read
+        return None
+    metadata = table.schema.metadata or {}
+    info = {
+        "filename": metadata.get(_META_FILENAME, b"").decode("utf-8"),
+        "version": int(metadata.get(_META_VERSION, b"0")),
+        "memory_report": json.loads(metadata.get(_META_MEMORY_REPORT, b"null")),
+    }
+    df = table.to_pandas(split_blocks=True)
+    return df, info
+
+
+def delete_dataset(owner: str):
+    _remove_segment(index.remove(dataset_id(owner)))
@@ -0,0 +1,252 @@
+# app/services/supabase_db.py
+
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from jose import jwt
+
+# Request timeouts (seconds); a slow Supabase fails the request instead of hanging it
+SUPABASE_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", "10"))
+SUPABASE_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT_SECONDS", "3"))
+# Keep-alive connection pool shared by every request of this worker
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_MAX_KEEPALIVE", "10"))
+SUPABASE_KEEPALIVE_SECONDS = float(os.environ.get("SUPABASE_KEEPALIVE_SECONDS", "30"))
+# Calls in flight at once; the rest wait here instead of piling up on the pool
+SUPABASE_MAX_CONCURRENCY = int(os.environ.get("SUPABASE_MAX_CONCURRENCY", "20"))
+# "memory" swaps Supabase for the in-process stand-in (offline development and load tests)
+SUPABASE_BACKEND = os.environ.get("SUPABASE_BACKEND", "http")
+# Simulated round trip of the stand-in, in milliseconds
+SUPABASE_MEMORY_LATENCY_MS = float(os.environ.get("SUPABASE_MEMORY_LATENCY_MS", "0"))
+
+
+class SupabaseError(Exception):
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SupabaseDB:
+    """
+    Async access to the Supabase REST (PostgREST) and auth (GoTrue) APIs over
+    one pooled keep-alive HTTP client. The client is created on first use,
+    inside the running event loop, and closed on shutdown.
+    """
+
+    def __init__(self, url: str | None = None, key: str | None = None, max_concurrency: int = SUPABASE_MAX_CONCURRENCY):
+        self.url = (url or os.environ.get("SUPABASE_URL") or "").rstrip("/")
+        self.key = key or os.environ.get("SUPABASE_KEY")
+        self.max_concurrency = max_concurrency
+        self._client: httpx.AsyncClient | None = None
+        self._limit: asyncio.Semaphore | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            if not self.url or not self.key:
+                raise SupabaseError("SUPABASE_URL and SUPABASE_KEY must be set")
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers={"apikey": self.key, "Authorization": f"Bearer {self.key}"},
+                timeout=httpx.Timeout(SUPABASE_TIMEOUT_SECONDS, connect=SUPABASE_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=SUPABASE_MAX_CONNECTIONS,
+                    max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                    keepalive_expiry=SUPABASE_KEEPALIVE_SECONDS,
+                ),
+            )
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _request(self, method: str, path: str, **kwargs):
+        client = self._get_client()
+        async with self._limit:
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.HTTPError as e:
+                raise SupabaseError(f"{method} {path} failed: {e!r}") from e
+        if response.status_code >= 400:
+            raise SupabaseError(f"{method} {path} returned {response.status_code}: {response.text}", response.status_code)
+        return response.json() if response.content else None
+
+    # ----------------------------------------------------------------
+    #  public.users
+    # ----------------------------------------------------------------
+
+    async def get_user(self, email: str) -> dict | None:
+        rows = await self._request("GET", "/rest/v1/users", params={"select": "*", "email": f"eq.{email}"})
+        return rows[0] if rows else None
+
+    async def insert_user(self, values: dict) -> dict:
+        rows = await self._request("POST", "/rest/v1/users", json=values, headers={"Prefer": "return=representation"})
+        return rows[0]
+
+    async def update_user(self, email: str, values: dict) -> dict | None:
+        rows = await self._request(
+            "PATCH", "/rest/v1/users",
+            params={"email": f"eq.{email}"}, json=values, headers={"Prefer": "return=representation"},
+        )
+        return rows[0] if rows else None
+
+    async def rpc(self, function: str, params: dict):
+        return await self._request("POST", f"/rest/v1/rpc/{function}", json=params)
+
+    async def upsert_google_user(self, email: str, username: str | None) -> dict:
+        """Creates the user on first Google sign-in and returns the row (supabase/migrations/*_upsert_google_user.sql)."""
+        rows = await self.rpc("upsert_google_user", {"p_email": email, "p_username": username})
+        return rows[0]
+
+    async def consume_credits(self, email: str, amount: int = 1) -> dict | None:
+        """
+        Takes `amount` credits in one atomic call (supabase/migrations/*_consume_credits.sql).
+        Returns {"consumed", "credits_remaining"}, or None when the user does not exist.
+        """
+        rows = await self.rpc("consume_credits", {"p_email": email, "p_amount": amount})
+        return rows[0] if rows else None
+
+    # ----------------------------------------------------------------
+    #  Auth
+    # ----------------------------------------------------------------
+
+    async def sign_up(self, email: str, password: str, data: dict | None = None) -> dict | None:
+        """Returns the new auth user, or None when none was created."""
+        body = await self._request("POST", "/auth/v1/signup", json={"email": email, "password": password, "data": data or {}})
+        # With email confirmation on, GoTrue answers with the bare user
+        user = body.get("user") or body
+        return user if user.get("id") else None
+
+    async def sign_in_with_password(self, email: str, password: str) -> dict | None:
+        """Returns the session (with its access_token), or None for bad credentials."""
+        try:
+            return await self._request(
+                "POST", "/auth/v1/token", params={"grant_type": "password"}, json={"email": email, "password": password},
+            )
+        except SupabaseError as e:
+            if e.status_code in (400, 401):
+                return None
+            raise
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class InMemorySupabase:
+    """
+    In-process stand-in with the same interface as SupabaseDB, for offline
+    development and load tests. Every call holds a concurrency slot and waits
+    `latency_ms`, so handlers see a realistic round trip without a network.
+    Sign-up creates the public profile itself, like the database trigger does.
+    """
+
+    def __init__(self, latency_ms: float = SUPABASE_MEMORY_LATENCY_MS, max_concurrency: int = SUPABASE_MAX_CONCURRENCY, starting_credits: int = 5):
+        self.latency_ms = latency_ms
+        self.max_concurrency = max_concurrency
+        self.starting_credits = starting_credits
+        self.users: dict[str, dict] = {}
+        self.accounts: dict[str, dict] = {}
+        self.calls = 0
+        self._limit: asyncio.Semaphore | None = None
+
+    async def _round_trip(self):
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        async with self._limit:
+            self.calls += 1
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    async def get_user(self, email: str) -> dict | None:
+        await self._round_trip()
+        user = self.users.get(email)
+        return dict(user) if user else None
+
+    async def insert_user(self, values: dict) -> dict:
+        await self._round_trip()
+        if values["email"] in self.users:
+            raise SupabaseError("duplicate key value violates unique constraint \"users_email_key\"", 409)
+        user = {"id": str(uuid.uuid4()), "graph_credits": self.starting_credits, **values}
+        self.users[user["email"]] = user
+        return dict(user)
+
+    async def update_user(self, email: str, values: dict) -> dict | None:
+        await self._round_trip()
+        user = self.users.get(email)
+        if user is None:
+            return None
+        user.update(values)
+        return dict(user)
+
+    async def rpc(self, function: str, params: dict):
+        await self._round_trip()
+        # Database functions are mirrored by rpc_<name> methods
+        handler = getattr(self, f"rpc_{function}", None)
+        if handler is None:
+            raise SupabaseError(f"function {function} does not exist", 404)
+        return handler(**params)
+
+    def rpc_consume_credits(self, p_email: str, p_amount: int = 1) -> list[dict]:
+        # No await between the check and the update, so it is atomic like the SQL version
+        if p_amount is None or p_amount < 1:
+            raise SupabaseError("p_amount must be a positive integer", 400)
+        user = self.users.get(p_email)
+        if user is None:
+            return []
+        balance = user.get("graph_credits") or 0
+        if balance < p_amount:
+            return [{"consumed": False, "credits_remaining": balance}]
+        user["graph_credits"] = balance - p_amount
+        return [{"consumed": True, "credits_remaining": user["graph_credits"]}]
+
+    def rpc_upsert_google_user(self, p_email: str, p_username: str | None) -> list[dict]:
+        user = self.users.get(p_email)
+        if user is None:
+            user = {"id": str(uuid.uuid4()), "email": p_email, "username": p_username, "graph_credits": self.starting_credits}
+            self.users[p_email] = user
+        return [dict(user)]
+
+    async def upsert_google_user(self, email: str, username: str | None) -> dict:
+        rows = await self.rpc("upsert_google_user", {"p_email": email, "p_username": username})
+        return rows[0]
+
+    async def consume_credits(self, email: str, amount: int = 1) -> dict | None:
+        rows = await self.rpc("consume_credits", {"p_email": email, "p_amount": amount})
+        return rows[0] if rows else None
+
+    async def sign_up(self, email: str, password: str, data: dict | None = None) -> dict | None:
+        await self._round_trip()
+        if email in self.accounts:
+            return None
+        account = {"id": str(uuid.uuid4()), "email": email, "password": password, "user_metadata": data or {}}
+        self.accounts[email] = account
+        self.users[email] = {
+            "id": account["id"], "email": email, "username": (data or {}).get("username"),
+            "graph_credits": self.starting_credits,
+        }
+        return {k: v for k, v in account.items() if k != "password"}
+
+    async def sign_in_with_password(self, email: str, password: str) -> dict | None:
+        await self._round_trip()
+        account = self.accounts.get(email)
+        if account is None or account["password"] != password:
+            return None
+        # Signed like the tokens get_current_user accepts
+        expires = datetime.now(timezone.utc) + timedelta(hours=1)
+        token = jwt.encode({"sub": email, "exp": expires}, os.environ.get("SECRET_KEY"), algorithm="HS256")
+        return {"access_token": token, "token_type": "bearer", "user": {"id": account["id"], "email": email}}
+
+    async def close(self):
+        pass
+
+
+def create_db():
+    if SUPABASE_BACKEND == "memory":
+        print("Using the in-memory Supabase stand-in")
+        return InMemorySupabase()
+    return SupabaseDB()
+
+
+# Shared data-access object of this worker
+db = create_db()
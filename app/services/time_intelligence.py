@@ -0,0 +1,142 @@
+# app/services/time_intelligence.py
+
+import numpy as np
+import pandas as pd
+
+from app.services.date_index import DateIndex
+
+ROLLUP_PERIODS = ("day", "month", "quarter", "year")
+
+
+def _growth_pct(current: float, previous: float) -> float | None:
+    return (current - previous) / previous * 100 if previous else None
+
+
+def _month_start(day: np.datetime64) -> np.datetime64:
+    return day.astype("datetime64[M]").astype("datetime64[D]")
+
+
+def _quarter_start(day: np.datetime64) -> np.datetime64:
+    month = day.astype("datetime64[M]").astype(np.int64)
+    return np.datetime64(int(month - month % 3), "M").astype("datetime64[D]")
+
+
+def _year_start(day: np.datetime64) -> np.datetime64:
+    return day.astype("datetime64[Y]").astype("datetime64[D]")
+
+
+def shift_months(day: np.datetime64, months: int) -> np.datetime64:
+    """
+    The same day `months` calendar months earlier or later, clipped to the
+    end of shorter months (e.g. Mar 31 - 1 month = Feb 28/29).
+    """
+    month = day.astype("datetime64[M]") + np.timedelta64(months, "M")
+    day_of_month = (day - _month_start(day)).astype(np.int64)
+    days_in_month = ((month + 1).astype("datetime64[D]") - month.astype("datetime64[D]")).astype(np.int64)
+    return month.astype("datetime64[D]") + np.timedelta64(min(day_of_month, days_in_month - 1), "D")
+
+
+class TimeCube:
+    """
+    Rollups of one numeric column by day, month, quarter and year, built once
+    per dataset version. Any period-to-date total is the difference of two
+    entries in the cumulative daily totals, found by binary search over the
+    distinct days, so a KPI refresh never scans the rows again.
+    Missing values count as 0; rows without a date are left out.
+    """
+
+    def __init__(self, days: np.ndarray, totals: np.ndarray):
+        self.days = days.astype("datetime64[D]")
+        self.totals = np.asarray(totals, dtype="float64")
+        self._cumulative = np.concatenate(([0.0], np.cumsum(self.totals)))
+        self._rollups = {"day": (pd.DatetimeIndex(self.days).strftime("%Y-%m-%d").tolist(), self.totals)}
+        for period in ("month", "quarter", "year"):
+            self._rollups[period] = self._roll_up(period)
+
+    @classmethod
+    def from_index(cls, date_index: DateIndex, values: np.ndarray) -> "TimeCube":
+        epochs, totals = date_index.aggregate(values, "day", "sum", label_format="epoch_ms")
+        return cls(np.asarray(epochs).astype("datetime64[ms]"), totals)
+
+    def _roll_up(self, period: str) -> tuple[list[str], np.ndarray]:
+        if len(self.days) == 0:
+            return [], np.empty(0)
+        months = self.days.astype("datetime64[M]").astype(np.int64)
+        if period == "month":
+            keys = months
+        elif period == "quarter":
+            keys = months - months % 3
+        else:
+            keys = self.days.astype("datetime64[Y]").astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        firsts = pd.DatetimeIndex(self.days[starts])
+        if period == "month":
+            labels = firsts.strftime("%Y-%m").tolist()
+        elif period == "quarter":
+            labels = [f"{ts.year}-Q{ts.quarter}" for ts in firsts]
+        else:
+            labels = firsts.strftime("%Y").tolist()
+        return labels, np.add.reduceat(self.totals, starts)
+
+    def rollup(self, period: str) -> tuple[list[str], np.ndarray]:
+        """Labels and totals of every period that has data, in date order."""
+        if period not in self._rollups:
+            raise ValueError(f"Unknown rollup period '{period}'")
+        return self._rollups[period]
+
+    def total(self, start: np.datetime64, end: np.datetime64) -> float:
+        """Total over the days start..end, both inclusive."""
+        lo = np.searchsorted(self.days, start, side="left")
+        hi = np.searchsorted(self.days, end, side="right")
+        return float(self._cumulative[hi] - self._cumulative[lo]) if hi > lo else 0.0
+
+    @property
+    def first_day(self) -> np.datetime64 | None:
+        return self.days[0] if len(self.days) else None
+
+    @property
+    def last_day(self) -> np.datetime64 | None:
+        return self.days[-1] if len(self.days) else None
+
+    def kpis(self, as_of=None) -> dict | None:
+        """
+        MTD/QTD/YTD totals up to and including `as_of` (default: the latest
+        date in the data). Growth rates compare like with like: YoY is YTD
+        against the same days of the previous year, MoM is MTD against the
+        same days of the previous month, and CAGR is the compound annual
+        growth from the first year's YTD to this year's YTD.
+        """
+        if len(self.days) == 0:
+            return None
+        as_of = self.last_day if as_of is None else np.datetime64(pd.Timestamp(as_of).date(), "D")
+
+        mtd = self.total(_month_start(as_of), as_of)
+        qtd = self.total(_quarter_start(as_of), as_of)
+        ytd = self.total(_year_start(as_of), as_of)
+
+        last_year = shift_months(as_of, -12)
+        previous_ytd = self.total(_year_start(last_year), last_year)
+        previous_year_total = self.total(_year_start(last_year), _year_start(as_of) - np.timedelta64(1, "D"))
+        last_month = shift_months(as_of, -1)
+        previous_mtd = self.total(_month_start(last_month), last_month)
+
+        cagr = None
+        n_years = int(as_of.astype("datetime64[Y]").astype(np.int64) - self.first_day.astype("datetime64[Y]").astype(np.int64))
+        if n_years > 0:
+            first_year = shift_months(as_of, -12 * n_years)
+            start_value = self.total(_year_start(first_year), first_year)
+            if start_value > 0 and ytd >= 0:
+                cagr = ((ytd / start_value) ** (1 / n_years) - 1) * 100
+
+        return {
+            "as_of": str(as_of),
+            "mtd": mtd,
+            "qtd": qtd,
+            "ytd": ytd,
+            "previous_year_total": previous_year_total,
+            "previous_ytd": previous_ytd,
+            "previous_mtd": previous_mtd,
+            "yoy_growth_pct": _growth_pct(ytd, previous_ytd),
+            "mom_growth_pct": _growth_pct(mtd, previous_mtd),
+            "cagr_pct": cagr,
+        }
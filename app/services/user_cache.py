@@ -0,0 +1,101 @@
+# app/services/user_cache.py
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable
+
+# How long a looked-up user record is served from memory
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class _LoadCancelled(Exception):
+    """Set on a shared lookup whose leading request was cancelled."""
+
+
+class UserCache:
+    """
+    In-process TTL cache of user records keyed by token subject.
+    Concurrent misses for the same subject share a single database call
+    (single-flight). Code that changes a user's credits or profile must
+    call invalidate() so the next request sees the new record.
+    """
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: dict[str, tuple[float, dict]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, subject: str, load: Callable[[], Awaitable[dict | None]]) -> dict | None:
+        while True:
+            entry = self._entries.get(subject)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            inflight = self._inflight.get(subject)
+            if inflight is None:
+                return await self._load(subject, load)
+            self.hits += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _LoadCancelled:
+                # The request doing the lookup went away; look up again
+                continue
+
+    async def _load(self, subject: str, load: Callable[[], Awaitable[dict | None]]) -> dict | None:
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[subject] = future
+        try:
+            user = await load()
+        except BaseException as e:
+            # Waiters must always be released, also when this request is cancelled
+            future.set_exception(_LoadCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            # Unknown users are not cached, so a new sign-up is seen right away.
+            # A load that raced with invalidate() may be stale and is not kept.
+            if user is not None and self._inflight.get(subject) is future:
+                self._store(subject, user)
+            future.set_result(user)
+            return user
+        finally:
+            if self._inflight.get(subject) is future:
+                del self._inflight[subject]
+
+    def _store(self, subject: str, user: dict):
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            for key in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, user)
+
+    def invalidate(self, subject: str):
+        self._entries.pop(subject, None)
+        # Requests arriving from now on must not join a lookup that started before the change
+        self._inflight.pop(subject, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache used by get_current_user in this worker
+user_cache = UserCache()
@@ -1,40 +1,84 @@
+import hashlib
+import os
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
+
+from app.services import large_data
+from app.services.dashboard_panels import panel_spec, render_panel
+
+CSV_FILE = "calculated_metrics.csv"
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+
+# -----------------------------
+# Cached data layer
+# Streamlit reruns this whole script on every widget interaction, so the file
+# is only hashed when its mtime/size change, only parsed when its content
+# changes, and each figure is only drawn once per file content.
+# -----------------------------
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def file_hash(path: str, mtime_ns: int, size: int) -> str:
+    # mtime_ns and size are part of the cache key: an unchanged file is never re-read
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# One shared, read-only DataFrame per file content (cache_resource doesn't copy it per rerun)
+@st.cache_resource(show_spinner="Loading data...", max_entries=2)
+def load_data(path: str, content_hash: str):
+    df = pd.read_csv(path)
+    dates_ms = None
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"])
+        dates_ms = df["Date"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+    return df, dates_ms
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def metric_figure(content_hash: str, kind: str, metric: str, _df: pd.DataFrame, _dates_ms) -> bytes:
+    # Keyed on the file content and the chart; the frame itself is not hashed
+    panel = {"id": f"{kind}:{metric}", "kind": kind, "columns": [metric], "title": metric}
+    spec = panel_spec(panel, _df.get, _dates_ms, large_data.is_large(len(_df)))
+    spec.update(width=800, height=400, format="png")
+    return render_panel(spec)
+
 
 # -----------------------------
 # Load CSV
 # -----------------------------
-df = pd.read_csv("calculated_metrics.csv")
-if "Date" in df.columns:
-    df["Date"] = pd.to_datetime(df["Date"])
+stat = os.stat(CSV_FILE)
+content_hash = file_hash(CSV_FILE, stat.st_mtime_ns, stat.st_size)
+df, dates_ms = load_data(CSV_FILE, content_hash)
 
 st.title(" Metrics Dashboard")
 
+line_metrics = ["Sales", "Profit", "Net_Profit_%"]
+bar_metrics = ["Profit_Margin_%","Gross_Margin_%"]
+has_date = "Date" in df.columns
+available = [metric for metric in dict.fromkeys(line_metrics + bar_metrics) if metric in df.columns and has_date]
+
+# Only the picked metrics are drawn
+selected = st.multiselect("Metrics", available, default=available)
+if large_data.is_large(len(df)):
+    st.caption(f"{len(df):,} rows: charts show a shape-preserving selection of points.")
+
 # -----------------------------
 # Line Charts
 # -----------------------------
-line_metrics = ["Sales", "Profit", "Net_Profit_%"]
 st.header("Line Charts")
 for metric in line_metrics:
-    if metric in df.columns and "Date" in df.columns:
-        fig, ax = plt.subplots(figsize=(8,4))
-        ax.plot(df["Date"], df[metric], marker='o')
-        ax.set_title(metric)
-        ax.set_xlabel("Date")
-        ax.set_ylabel(metric)
-        ax.grid(True)
-        st.pyplot(fig)  # Important: display each graph individually
+    if metric in selected:
+        st.image(metric_figure(content_hash, "line", metric, df, dates_ms))  # Important: display each graph individually
 
 # -----------------------------
 # Bar Charts
 # -----------------------------
-bar_metrics = ["Profit_Margin_%","Gross_Margin_%"]
 st.header("Bar Charts")
 for metric in bar_metrics:
-    if metric in df.columns and "Date" in df.columns:
-        fig, ax = plt.subplots(figsize=(8,4))
-        sns.barplot(x=df["Date"], y=df[metric], ax=ax)
-        ax.set_title(metric)
-        st.pyplot(fig)
+    if metric in selected:
+        st.image(metric_figure(content_hash, "bar", metric, df, dates_ms))
@@ -1,10 +1,12 @@
-
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 import math
 import os
 
+from app.services import large_data
+from app.services.dashboard_panels import draw_panel, panel_spec, plan_panels
+
 # -----------------------------
 # Load CSV
 # -----------------------------
@@ -15,87 +17,36 @@ if not os.path.exists(csv_file):
 df = pd.read_csv(csv_file)
 
 # Convert Date column to datetime if exists
+dates_ms = None
 if "Date" in df.columns:
     df["Date"] = pd.to_datetime(df["Date"])
+    dates_ms = df["Date"].to_numpy().astype("datetime64[ms]").astype(np.int64)
+
+# Large files: binned/quantile/hexbin drawings whose cost doesn't grow with the rows
+large = large_data.is_large(len(df))
+if large:
+    print(f"{len(df)} rows: using large-data drawings")
 
 # -----------------------------
-# Define metrics
+# Define panels (the same ones GET /api/dashboard/stream serves)
 # -----------------------------
-line_metrics = ["Sales", "Profit", "Net_Profit_%", "Operating_Margin_%"]
-bar_metrics = ["Profit_Margin_%","Gross_Margin_%","Conversion_Rate_%","Retention_Rate_%","Churn_Rate_%"]
-hist_metrics = ["Daily_Sales","Avg_Resolution_Time","Utilization_%","Stock_Turnover","On_Time_Delivery_%"]
-box_metrics = ["Sales", "Profit", "Net_Profit_%", "Daily_Sales"]
-scatter_pairs = [("Sales","Profit"), ("CLV","CAC")]
+panels = plan_panels(df.columns, "Date" in df.columns)
 
 # Total plots for layout
-total_plots = len(line_metrics) + len(bar_metrics) + len(hist_metrics) + len(box_metrics) + len(scatter_pairs) + 1
 cols = 3
-rows = math.ceil(total_plots / cols)
+rows = max(1, math.ceil(len(panels) / cols))
 
 # -----------------------------
 # Create dashboard figure
 # -----------------------------
 fig, axes = plt.subplots(rows, cols, figsize=(20, rows*5))
 axes = axes.flatten()
-plot_idx = 0
-
-# LINE CHARTS
-for col_name in line_metrics:
-    if col_name in df.columns and "Date" in df.columns:
-        axes[plot_idx].plot(df["Date"], df[col_name], marker='o', color='blue')
-        axes[plot_idx].set_title(col_name)
-        axes[plot_idx].set_xlabel("Date")
-        axes[plot_idx].set_ylabel(col_name)
-        axes[plot_idx].grid(True)
-        plot_idx += 1
-
-# BAR CHARTS
-for col_name in bar_metrics:
-    if col_name in df.columns and "Date" in df.columns:
-        sns.barplot(x=df["Date"], y=df[col_name], ax=axes[plot_idx], palette="viridis")
-        axes[plot_idx].set_title(col_name)
-        axes[plot_idx].set_xlabel("Date")
-        axes[plot_idx].set_ylabel(col_name)
-        axes[plot_idx].tick_params(axis='x', rotation=45)
-        plot_idx += 1
-
-# HISTOGRAMS
-for col_name in hist_metrics:
-    if col_name in df.columns:
-        sns.histplot(df[col_name], bins=10, kde=True, ax=axes[plot_idx], color='skyblue')
-        axes[plot_idx].set_title(f"Distribution of {col_name}")
-        axes[plot_idx].set_xlabel(col_name)
-        axes[plot_idx].set_ylabel("Frequency")
-        plot_idx += 1
-
-# BOX PLOTS
-for col_name in box_metrics:
-    if col_name in df.columns:
-        sns.boxplot(x=df[col_name], ax=axes[plot_idx], color='lightgreen')
-        axes[plot_idx].set_title(f"Boxplot of {col_name}")
-        plot_idx += 1
-
-# SCATTER PLOTS
-for x_col, y_col in scatter_pairs:
-    if x_col in df.columns and y_col in df.columns:
-        sns.scatterplot(x=df[x_col], y=df[y_col], ax=axes[plot_idx])
-        sns.regplot(x=df[x_col], y=df[y_col], scatter=False, ax=axes[plot_idx], color='red')
-        axes[plot_idx].set_title(f"{y_col} vs {x_col}")
-        plot_idx += 1
 
-# CUMULATIVE + ROLLING SALES
-if "Sales" in df.columns and "Date" in df.columns:
-    axes[plot_idx].plot(df["Date"], df["Sales"].cumsum(), marker='o', label="Cumulative Sales")
-    axes[plot_idx].plot(df["Date"], df["Sales"].rolling(3).mean(), marker='x', label="3M Rolling Avg")
-    axes[plot_idx].set_title("Cumulative & Rolling Avg Sales")
-    axes[plot_idx].set_xlabel("Date")
-    axes[plot_idx].set_ylabel("Sales")
-    axes[plot_idx].legend()
-    axes[plot_idx].grid(True)
-    plot_idx += 1
+for plot_idx, panel in enumerate(panels):
+    draw_panel(axes[plot_idx], panel_spec(panel, df.get, dates_ms, large))
 
 # Remove unused axes
-for i in range(plot_idx, len(axes)):
+for i in range(len(panels), len(axes)):
     fig.delaxes(axes[i])
 
 plt.tight_layout()
@@ -0,0 +1,39 @@
+-- Atomic credit consumption: one round trip, no read-modify-write race.
+-- The balance check and the decrement happen in a single UPDATE, so
+-- concurrent requests can neither double-spend nor lose a decrement.
+--
+-- Returns one row (consumed, credits_remaining):
+--   consumed = true   the credits were taken, credits_remaining is the new balance
+--   consumed = false  the balance is too low and was left untouched
+-- and no row when the user does not exist.
+
+create or replace function public.consume_credits(p_email text, p_amount integer default 1)
+returns table (consumed boolean, credits_remaining integer)
+language plpgsql
+as $$
+begin
+  if p_amount is null or p_amount < 1 then
+    raise exception 'p_amount must be a positive integer';
+  end if;
+
+  return query
+    update public.users
+       set graph_credits = graph_credits - p_amount
+     where email = p_email
+       and graph_credits >= p_amount
+    returning true, graph_credits;
+
+  if not found then
+    return query
+      select false, coalesce(u.graph_credits, 0)
+        from public.users u
+       where u.email = p_email;
+  end if;
+end;
+$$;
+
+-- Only the backend (service role key) may spend credits. Functions are
+-- executable by PUBLIC by default, which would let any client holding the
+-- anon key drain another user's balance through /rest/v1/rpc.
+revoke execute on function public.consume_credits(text, integer) from public, anon, authenticated;
+grant execute on function public.consume_credits(text, integer) to service_role;
@@ -0,0 +1,19 @@
+-- Google sign-in in one round trip: creates the profile on first login and
+-- returns the (new or existing) row either way. An existing user's profile
+-- is left as it is. Relies on the unique constraint on users.email.
+
+create or replace function public.upsert_google_user(p_email text, p_username text)
+returns setof public.users
+language sql
+as $$
+  insert into public.users (email, username)
+  values (p_email, p_username)
+  on conflict (email) do update
+    set email = excluded.email  -- no-op update so RETURNING yields the existing row
+  returning *;
+$$;
+
+-- Only the backend (service role key) may create profiles, after it has
+-- verified the Google ID token; clients must not call this through /rest/v1/rpc.
+revoke execute on function public.upsert_google_user(text, text) from public, anon, authenticated;
+grant execute on function public.upsert_google_user(text, text) to service_role;
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Tests run offline against the in-memory Supabase stand-in
+os.environ.setdefault("SUPABASE_BACKEND", "memory")
+os.environ.setdefault("SUPABASE_MEMORY_LATENCY_MS", "0")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An empty dataset store in a temporary directory."""
+    from app.services import storage
+
+    # Segments and the shared index live under a relative UPLOAD_DIR
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(storage.UPLOAD_DIR)
+    monkeypatch.setattr(storage, "index", storage.SharedIndex())
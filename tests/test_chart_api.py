@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.services.serialization import ARROW_STREAM_MEDIA_TYPE
+
+
+@pytest.fixture
+def client(store):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import storage
+
+    df = pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=1000, freq="h"),
+        "Sales": np.arange(1000, dtype="float64"),
+        "Region": np.array(["N", "S", "E", "W", "N"] * 200),
+    })
+    storage.save_dataset("session:abc", df, "sales.csv", storage.new_version())
+    return TestClient(app, cookies={"morph_session": "abc"})
+
+
+def test_json_series_by_default(client):
+    response = client.post("/api/chart", json={"metric": "Sales", "type": "line"})
+
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    assert body["status"] == "success"
+    assert body["labels"][:2] == ["2024-01-01", "2024-01-01"]
+    assert body["values"] == list(range(1000))
+
+
+def test_arrow_series_when_accepted(client):
+    request = {"metric": "Sales", "type": "line", "label_format": "epoch_ms"}
+    response = client.post("/api/chart", json=request, headers={"Accept": ARROW_STREAM_MEDIA_TYPE})
+
+    assert response.headers["content-type"] == ARROW_STREAM_MEDIA_TYPE
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.field("values").type == pa.float64()
+    assert table.schema.field("labels").type == pa.int64()
+    assert table.schema.metadata[b"status"] == b"success"
+    assert table["values"].to_pylist() == list(range(1000))
+    assert pd.to_datetime(table["labels"][1].as_py(), unit="ms") == pd.Timestamp("2024-01-01 01:00")
+
+
+def test_formats_are_cached_and_revalidated_separately(client):
+    request = {"metric": "Sales", "type": "line"}
+    as_json = client.post("/api/chart", json=request)
+    as_arrow = client.post("/api/chart", json=request, headers={"Accept": ARROW_STREAM_MEDIA_TYPE})
+
+    assert as_json.headers["etag"] != as_arrow.headers["etag"]
+    assert "Accept" in as_json.headers["vary"]
+    revalidated = client.post("/api/chart", json=request, headers={"If-None-Match": as_json.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    # A client holding the JSON copy must not get a 304 for the Arrow one
+    mismatched = client.post("/api/chart", json=request, headers={
+        "Accept": ARROW_STREAM_MEDIA_TYPE, "If-None-Match": as_json.headers["etag"],
+    })
+    assert mismatched.status_code == 200
+
+
+def test_text_labels_in_arrow(client):
+    response = client.post("/api/chart", json={"metric": "Region", "type": "bar"}, headers={"Accept": ARROW_STREAM_MEDIA_TYPE})
+
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert dict(zip(table["labels"].to_pylist(), table["values"].to_pylist())) == {"N": 400, "S": 200, "E": 200, "W": 200}
+
+
+def test_top_n_folds_rare_values_into_other(client):
+    response = client.post("/api/chart", json={"metric": "Region", "type": "bar", "top_n": 2})
+
+    body = response.json()
+    assert body["labels"][0] == "N"
+    assert body["labels"][2] == "Other"
+    assert body["values"] == [400, 200, 400]
+    # top_n at or above the number of values changes nothing
+    full = client.post("/api/chart", json={"metric": "Region", "type": "bar", "top_n": 4}).json()
+    assert sorted(full["labels"]) == ["E", "N", "S", "W"]
+
+
+def test_value_counts_are_counted_once_per_dataset_version(client):
+    from app.services.file_handler import get_dataset
+
+    dataset = get_dataset("session:abc")
+    categories, counts = dataset.value_counts("Region")
+
+    assert categories.tolist()[0] == "N"
+    assert counts.tolist() == [400, 200, 200, 200]
+    assert dataset.value_counts("Region")[0] is categories
+
+
+def test_value_counts_of_category_columns_use_their_codes():
+    from app.services.dataset_registry import Dataset
+
+    region = pd.Categorical(["S", None, "N", "S", "S"], categories=["N", "S", "unused"])
+    dataset = Dataset(owner="a", filename="a.csv", df=pd.DataFrame({"Region": region}), nbytes=0, version=1)
+
+    categories, counts = dataset.value_counts("Region")
+
+    # Missing values and categories that never occur are left out
+    assert categories.tolist() == ["S", "N"]
+    assert counts.tolist() == [3, 1]
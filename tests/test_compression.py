@@ -0,0 +1,81 @@
+import gzip
+
+import anyio
+import brotli
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.services import compression
+from app.services.compression import CompressionMiddleware
+
+PAYLOAD = {"labels": list(range(5000)), "values": [1.5] * 5000}
+
+
+def _client(**options) -> TestClient:
+    async def data(request):
+        return JSONResponse(PAYLOAD)
+
+    async def small(request):
+        return PlainTextResponse("ok")
+
+    async def stream(request):
+        async def chunks():
+            for i in range(3):
+                yield f"{i}\n".encode() * 1000
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    app = Starlette(routes=[Route("/data", data), Route("/small", small), Route("/stream", stream)])
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app)
+
+
+def _raw_body(response) -> bytes:
+    return b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("encoding, decompress", [("gzip", gzip.decompress), ("br", brotli.decompress)])
+def test_compressed_response_decodes_to_the_original(encoding, decompress):
+    with _client().stream("GET", "/data", headers={"Accept-Encoding": encoding}) as response:
+        body = _raw_body(response)
+
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["content-length"] == str(len(body))
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert decompress(body) == JSONResponse(PAYLOAD).body
+
+
+def test_brotli_is_preferred_over_gzip():
+    response = _client().get("/data", headers={"Accept-Encoding": "gzip, deflate, br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == PAYLOAD
+
+
+def test_small_streaming_and_unaccepted_responses_are_sent_as_is():
+    client = _client()
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/stream", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/data", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_large_bodies_are_compressed_in_a_worker_thread(monkeypatch):
+    offloaded = []
+    run_sync = anyio.to_thread.run_sync
+
+    async def recording_run_sync(func, *args, **kwargs):
+        offloaded.append(len(args[0]))
+        return await run_sync(func, *args, **kwargs)
+
+    monkeypatch.setattr(compression.anyio.to_thread, "run_sync", recording_run_sync)
+
+    response = _client(thread_min_size=10_000).get("/data", headers={"Accept-Encoding": "gzip"})
+    assert response.json() == PAYLOAD
+    assert offloaded == [len(JSONResponse(PAYLOAD).body)]
+
+    offloaded.clear()
+    _client(thread_min_size=10_000_000).get("/data", headers={"Accept-Encoding": "gzip"})
+    assert offloaded == []
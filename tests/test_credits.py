@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api import auth, credits
+from app.services.supabase_db import InMemorySupabase, SupabaseError
+from app.services.user_cache import user_cache
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    # A round trip long enough for concurrent requests to interleave
+    db = InMemorySupabase(latency_ms=5, starting_credits=10)
+    monkeypatch.setattr(auth, "db", db)
+    monkeypatch.setattr(credits, "db", db)
+    user_cache.clear()
+    yield db
+    user_cache.clear()
+
+
+def test_concurrent_consume_never_overspends(memory_db):
+    async def scenario():
+        await memory_db.insert_user({"email": "a@example.com"})
+        return await asyncio.gather(*(memory_db.consume_credits("a@example.com") for _ in range(25)))
+
+    results = asyncio.run(scenario())
+
+    assert sum(result["consumed"] for result in results) == 10
+    assert memory_db.users["a@example.com"]["graph_credits"] == 0
+    assert all(result["credits_remaining"] == 0 for result in results if not result["consumed"])
+
+
+def test_consume_takes_all_or_nothing(memory_db):
+    async def scenario():
+        await memory_db.insert_user({"email": "a@example.com"})
+        return (
+            await memory_db.consume_credits("a@example.com", 7),
+            await memory_db.consume_credits("a@example.com", 7),
+            await memory_db.consume_credits("missing@example.com"),
+        )
+
+    taken, refused, missing = asyncio.run(scenario())
+
+    assert taken == {"consumed": True, "credits_remaining": 3}
+    assert refused == {"consumed": False, "credits_remaining": 3}
+    assert missing is None
+    with pytest.raises(SupabaseError):
+        asyncio.run(memory_db.consume_credits("a@example.com", 0))
+
+
+def test_use_credit_endpoint_under_concurrent_requests(memory_db):
+    from app.main import app
+
+    async def scenario():
+        await memory_db.sign_up("a@example.com", "secret", {"username": "a"})
+        session = await memory_db.sign_in_with_password("a@example.com", "secret")
+        cookies = {"access_token": f"Bearer {session['access_token']}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookies) as client:
+            return await asyncio.gather(*(client.post("/api/use-credit") for _ in range(25)))
+
+    responses = asyncio.run(scenario())
+
+    assert all(response.status_code == 200 for response in responses)
+    statuses = [response.json()["status"] for response in responses]
+    assert statuses.count("success") == 10
+    assert statuses.count("insufficient_credits") == 15
+    assert memory_db.users["a@example.com"]["graph_credits"] == 0
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from app.api import dashboard
+from app.services.dataset_registry import Dataset
+
+
+def _dataset(df: pd.DataFrame) -> Dataset:
+    return Dataset(owner="owner", filename="data.csv", df=df, nbytes=int(df.memory_usage(deep=True).sum()), version=1)
+
+
+def test_chart_image_of_a_text_column_keeps_the_top_categories(monkeypatch):
+    monkeypatch.setattr(dashboard, "CHART_IMAGE_TOP_N", 5)
+    # 1000 distinct customers, customer i appears i + 1 times
+    names = np.repeat([f"c{i}" for i in range(1000)], np.arange(1, 1001))
+    dataset = _dataset(pd.DataFrame({"Customer": names}))
+
+    spec = dashboard.build_render_spec(dataset, "Customer", "bar", 800, 400, "png")
+
+    assert spec["x"] == ["c999", "c998", "c997", "c996", "c995", "Other"]
+    assert spec["y"].sum() == len(names)
+    assert spec["y"][-1] == len(names) - (1000 + 999 + 998 + 997 + 996)
+
+
+def test_chart_image_of_a_numeric_column_is_downsampled():
+    dataset = _dataset(pd.DataFrame({"Sales": np.random.default_rng(0).random(10_000)}))
+
+    spec = dashboard.build_render_spec(dataset, "Sales", "line", 400, 300, "png")
+
+    assert spec["x_kind"] == "index"
+    assert len(spec["y"]) <= 800
+
+
+def test_panels_follow_the_dashboard_layout():
+    from app.services.dashboard_panels import plan_panels
+
+    panels = plan_panels(["Sales", "Profit", "Churn_Rate_%", "CLV"], has_date=True)
+
+    assert [panel["id"] for panel in panels] == [
+        "line:Sales", "line:Profit", "bar:Churn_Rate_%", "box:Sales", "box:Profit",
+        "scatter:Sales|Profit", "cumulative:Sales",
+    ]
+    # Time series need a Date column
+    assert [panel["kind"] for panel in plan_panels(["Sales", "Profit"], has_date=False)] == ["box", "box", "scatter"]
+
+
+def test_large_panels_carry_a_bounded_spec():
+    from app.services.dashboard_panels import PANEL_MAX_BARS, PANEL_MAX_POINTS, panel_spec
+
+    rows = 200_000
+    df = pd.DataFrame({"Sales": np.random.default_rng(0).random(rows), "Profit": np.random.default_rng(1).random(rows)})
+    dates_ms = np.arange(rows, dtype=np.int64) * 60_000
+
+    def spec(kind, columns):
+        return panel_spec({"kind": kind, "columns": columns, "title": kind}, df.get, dates_ms, large=True)
+
+    assert len(spec("line", ["Sales"])["y"]) <= PANEL_MAX_POINTS
+    assert len(spec("bar", ["Sales"])["y"]) <= PANEL_MAX_BARS
+    assert len(spec("hist", ["Sales"])["counts"]) <= 100
+    assert "values" not in spec("box", ["Sales"])
+    assert len(spec("scatter", ["Sales", "Profit"])["x"]) < rows
+
+
+def _stream_client(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import chart_render, storage
+
+    async def run_in_process(render, spec):
+        return render(spec)
+
+    # Panels are drawn in the test process instead of the spawned render pool
+    monkeypatch.setattr(chart_render, "run_in_pool", run_in_process)
+    monkeypatch.setattr(dashboard, "render_cache", chart_render.RenderCache(directory="renders"))
+    df = pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=50, freq="D"),
+        "Sales": np.arange(50, dtype="float64"),
+        "Profit": np.arange(50, dtype="float64") / 10,
+    })
+    storage.save_dataset("session:abc", df, "sales.csv", storage.new_version())
+    return TestClient(app, cookies={"morph_session": "abc"})
+
+
+def test_stream_sends_every_panel_as_ndjson(store, monkeypatch):
+    import base64
+    import json
+
+    client = _stream_client(monkeypatch)
+
+    response = client.get("/api/dashboard/stream", params={"width": 300, "height": 200})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["cache-control"] == "no-cache"
+    events = [json.loads(line) for line in response.text.splitlines()]
+    start, panels, done = events[0], events[1:-1], events[-1]
+    assert start["event"] == "start" and start["large_data"] is False
+    assert done == {"event": "done", "panels": len(start["panels"]), "elapsed_ms": done["elapsed_ms"]}
+    assert all(event["event"] == "panel" for event in panels)
+    assert sorted(event["index"] for event in panels) == list(range(len(start["panels"])))
+    image = panels[0]["image"]
+    assert image.startswith("data:image/png;base64,")
+    assert base64.b64decode(image.split(",", 1)[1]).startswith(b"\x89PNG")
+
+
+def test_stream_as_server_sent_events(store, monkeypatch):
+    client = _stream_client(monkeypatch)
+
+    response = client.get("/api/dashboard/stream", params={"format": "sse", "image": "svg", "width": 300, "height": 200})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    assert blocks[0].startswith("event: start\ndata: {")
+    assert blocks[-1].startswith("event: done\ndata: {")
+    assert all(block.startswith("event: panel\n") for block in blocks[1:-1])
+    assert "data:image/svg+xml;base64," in blocks[1]
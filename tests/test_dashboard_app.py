@@ -0,0 +1,66 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dashboard_app.py")
+
+
+def _write_metrics(sales_offset: float = 0.0):
+    pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=30, freq="D").strftime("%Y-%m-%d"),
+        "Sales": np.arange(30, dtype="float64") + sales_offset,
+        "Profit": np.ones(30),
+        "Profit_Margin_%": np.full(30, 10.0),
+    }).to_csv("calculated_metrics.csv", index=False)
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The script runner installs the app as __main__; spawned worker pools of later tests would run it
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    reads = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        reads.append(args[0])
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_csv", counting_read_csv)
+    _write_metrics()
+    yield reads
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def test_draws_each_available_metric(app_dir):
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+
+    assert not at.exception
+    assert at.multiselect[0].value == ["Sales", "Profit", "Profit_Margin_%"]
+    assert len(at.get("image")) == 3
+
+
+def test_reruns_reuse_the_parsed_file(app_dir):
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    at.multiselect[0].set_value(["Sales"]).run()
+
+    assert not at.exception
+    assert len(at.get("image")) == 1
+    assert app_dir == ["calculated_metrics.csv"]
+
+
+def test_changed_file_is_read_again(app_dir):
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    _write_metrics(sales_offset=1000.0)
+    at.run()
+
+    assert not at.exception
+    assert app_dir == ["calculated_metrics.csv", "calculated_metrics.csv"]
@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.services import storage
+from app.services.dataset_registry import DatasetRegistry
+
+
+def _upload(owner: str, rows: int = 10_000):
+    df = pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=rows, freq="h"),
+        "Sales": np.arange(rows, dtype="float64"),
+        "Profit": np.ones(rows),
+    })
+    storage.save_dataset(owner, df, f"{owner}.csv", storage.new_version())
+
+
+def test_evicted_dataset_stays_usable_by_requests_holding_it(store):
+    _upload("a")
+    _upload("b")
+    registry = DatasetRegistry(memory_budget_bytes=1)
+
+    held = registry.get("a")
+    # Another owner's request pushes "a" out of memory mid-computation
+    registry.get("b")
+    assert registry.stats()["datasets"] == 1
+
+    assert "Profit_Margin_%" in held.available_columns()
+    assert held.column("Profit_Margin_%").iloc[1] == 100.0
+    assert held.time_cube("Sales").rollup("year")[1].sum() == held.df["Sales"].sum()
+
+    again = registry.get("a")
+    assert again is not held
+    assert again.version == held.version
+    assert again.column("Sales").sum() == held.column("Sales").sum()
+
+
+def test_idle_datasets_are_evicted(store):
+    _upload("a")
+    _upload("b")
+    registry = DatasetRegistry(idle_seconds=0)
+
+    held = registry.get("a")
+    registry.get("b")
+
+    assert registry.stats()["datasets"] == 1
+    assert held.df is not None
+
+
+def test_loading_one_dataset_does_not_block_other_owners(store, monkeypatch):
+    _upload("a")
+    _upload("b")
+    registry = DatasetRegistry()
+    load = storage.load_dataset
+    a_loading = threading.Event()
+    release_a = threading.Event()
+
+    def slow_load(path):
+        if path == storage.lookup_dataset("a")["path"]:
+            a_loading.set()
+            release_a.wait(5)
+        return load(path)
+
+    monkeypatch.setattr(storage, "load_dataset", slow_load)
+    with ThreadPoolExecutor(2) as pool:
+        a = pool.submit(registry.get, "a")
+        assert a_loading.wait(5)
+        try:
+            # "b" is served while "a" is still being read from disk
+            assert pool.submit(registry.get, "b").result(timeout=2).owner == "b"
+        finally:
+            release_a.set()
+        assert a.result(timeout=5).owner == "a"
+
+
+def test_concurrent_lookups_load_a_dataset_once(store, monkeypatch):
+    _upload("a")
+    registry = DatasetRegistry()
+    load = storage.load_dataset
+    loads = []
+
+    def counting_load(path):
+        loads.append(path)
+        return load(path)
+
+    monkeypatch.setattr(storage, "load_dataset", counting_load)
+    with ThreadPoolExecutor(8) as pool:
+        datasets = list(pool.map(registry.get, ["a"] * 8))
+
+    assert len(loads) == 1
+    assert all(d is datasets[0] for d in datasets)
+
+
+def test_derived_metrics_are_computed_on_first_use():
+    from app.services.dataset_registry import Dataset
+    from app.services.file_handler import calculate_all_metrics
+
+    raw = pd.DataFrame({"Sales": [100.0, 200.0, 0.0], "Profit": [10.0, 50.0, 5.0], "Cost": [60.0, 120.0, 1.0]})
+    eager = calculate_all_metrics(raw.copy())
+    lazy = calculate_all_metrics(raw.copy(), lazy=True)
+    assert list(lazy.columns) == list(raw.columns)
+
+    dataset = Dataset(owner="a", filename="a.csv", df=lazy, nbytes=int(lazy.memory_usage(deep=True).sum()), version=1)
+    nbytes = dataset.nbytes
+    # Listed before they are computed, so the summary can offer them
+    assert {"Profit_Margin_%", "Gross_Margin_%"} <= set(dataset.available_columns())
+    assert "Conversion_Rate_%" not in dataset.available_columns()
+
+    margin = dataset.column("Profit_Margin_%")
+    pd.testing.assert_series_equal(margin, eager["Profit_Margin_%"])
+    assert "Profit_Margin_%" in dataset.df.columns
+    assert "Gross_Margin_%" not in dataset.df.columns
+    assert dataset.nbytes == nbytes + margin.nbytes
+    # Cached on the frame: a second lookup computes and counts nothing
+    dataset.column("Profit_Margin_%")
+    assert dataset.nbytes == nbytes + margin.nbytes
+    assert dataset.column("Conversion_Rate_%") is None
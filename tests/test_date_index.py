@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.date_index import DateIndex
+
+
+def _frame(sorted_dates: bool = True) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    dates = pd.Series(pd.date_range("2023-11-20", "2024-03-10", freq="7h"))
+    if not sorted_dates:
+        dates = dates.sample(frac=1, random_state=1).reset_index(drop=True)
+    values = rng.random(len(dates)) * 100
+    values[::11] = np.nan
+    return pd.DataFrame({"Date": dates, "Sales": values})
+
+
+@pytest.mark.parametrize("sorted_dates", [True, False])
+@pytest.mark.parametrize("bucket, freq", [("day", "D"), ("week", "W-MON"), ("month", "M"), ("quarter", "Q"), ("year", "Y")])
+@pytest.mark.parametrize("agg", ["sum", "mean", "min", "max", "count"])
+def test_aggregate_matches_pandas(sorted_dates, bucket, freq, agg):
+    df = _frame(sorted_dates)
+
+    labels, values = DateIndex(df["Date"]).aggregate(df["Sales"].to_numpy(), bucket, agg)
+
+    if bucket == "week":
+        # Weeks start on Monday
+        keys = (df["Date"].dt.normalize() - pd.to_timedelta(df["Date"].dt.weekday, unit="D"))
+    else:
+        keys = df["Date"].dt.to_period(freq).dt.start_time
+    expected = df.groupby(keys)["Sales"].agg(agg).fillna(0)
+    assert len(labels) == len(expected)
+    np.testing.assert_allclose(values, expected.to_numpy())
+
+
+def test_labels_and_epochs():
+    df = _frame()
+    index = DateIndex(df["Date"])
+
+    labels, _ = index.aggregate(df["Sales"].to_numpy(), "quarter", "sum")
+    epochs, _ = index.aggregate(df["Sales"].to_numpy(), "month", "sum", label_format="epoch_ms")
+
+    assert labels == ["2023-Q4", "2024-Q1"]
+    assert pd.to_datetime(epochs, unit="ms").strftime("%Y-%m").tolist() == ["2023-11", "2023-12", "2024-01", "2024-02", "2024-03"]
+
+
+def test_rows_without_a_date_are_left_out():
+    dates = pd.Series(pd.to_datetime(["2024-01-02", None, "2024-01-01", "2024-01-02"]))
+
+    labels, values = DateIndex(dates).aggregate(np.array([1.0, 100.0, 2.0, 3.0]), "day", "sum")
+
+    assert labels == ["2024-01-01", "2024-01-02"]
+    assert values.tolist() == [2.0, 4.0]
+
+
+def test_row_labels_match_formatting_each_date():
+    dates = pd.Series(pd.to_datetime(["2024-03-01 10:30", "2024-03-01 23:59", None, "2023-12-31 00:00"]))
+    index = DateIndex(dates)
+
+    assert index.row_labels() == ["2024-03-01", "2024-03-01", "", "2023-12-31"]
+    assert index.row_labels(np.array([3, 0])) == ["2023-12-31", "2024-03-01"]
+    epochs = index.row_labels(label_format="epoch_ms")
+    assert epochs.dtype == np.int64
+    assert epochs[[0, 3]].tolist() == dates[[0, 3]].astype("datetime64[ms]").astype(np.int64).tolist()
+    assert epochs[2] == 0
+    # The full axis is shared, not copied per request
+    assert index.row_labels(label_format="epoch_ms") is epochs
+
+
+def test_timezone_aware_dates_use_their_wall_clock_day():
+    dates = pd.Series(pd.date_range("2024-01-01 23:00", periods=3, freq="h", tz="Asia/Kolkata"))
+
+    assert DateIndex(dates).row_labels() == ["2024-01-01", "2024-01-02", "2024-01-02"]
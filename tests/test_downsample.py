@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from app.services.downsample import downsample_indices, lttb_indices, minmax_indices
+
+
+def _noisy_series(n: int = 10_000) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    x = np.arange(n, dtype="float64")
+    y = np.sin(x / 500) + rng.normal(0, 0.05, n)
+    y[4321] = 10   # spike
+    y[7777] = -10  # dip
+    return x, y
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    x, y = _noisy_series()
+
+    selected = lttb_indices(x, y, 500)
+
+    assert len(selected) == 500
+    assert selected[0] == 0 and selected[-1] == len(y) - 1
+    assert np.all(np.diff(selected) > 0)
+    assert 4321 in selected and 7777 in selected
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    _, y = _noisy_series()
+
+    selected = minmax_indices(y, 500)
+
+    assert len(selected) <= 500
+    assert np.all(np.diff(selected) > 0)
+    assert 4321 in selected and 7777 in selected
+    # The selection spans the same value range as the full series
+    assert y[selected].min() == y.min() and y[selected].max() == y.max()
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_short_series_are_returned_whole(method):
+    y = np.arange(10, dtype="float64")
+
+    assert downsample_indices(np.arange(10), y, 100, method).tolist() == list(range(10))
@@ -0,0 +1,47 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+
+from app.main import build_summary
+from app.services.dataset_registry import Dataset
+from app.services.dtype_optimizer import optimize_dtypes
+from app.services.file_handler import read_csv_streaming
+
+
+def test_summary_total_matches_the_exact_csv_total():
+    rng = np.random.default_rng(0)
+    # Every value is exact in float32, but a float32 total of 300k of them is not
+    sales = rng.integers(0, 250_000, 300_000) + 0.5
+    raw = pd.DataFrame({"Sales": sales, "Region": rng.choice(["N", "S"], len(sales))}).to_csv(index=False).encode()
+    exact = math.fsum(pd.read_csv(io.BytesIO(raw))["Sales"])
+
+    df, _ = optimize_dtypes(read_csv_streaming(io.BytesIO(raw), progress=None))
+    summary = build_summary(Dataset(owner="owner", filename="sales.csv", df=df, nbytes=0, version=1))
+
+    assert summary["total_sales"] == exact
+
+
+def test_optimized_columns_keep_values_and_totals():
+    df = pd.DataFrame({
+        "Units": np.full(100_000, 200, dtype="int64"),
+        "Delta": np.tile([-3, 4], 50_000),
+        "Price": np.full(100_000, 0.1),
+        "Region": ["North", "South"] * 50_000,
+        "Id": [f"id-{i}" for i in range(100_000)],
+    })
+    expected = df.copy()
+
+    optimized, report = optimize_dtypes(df)
+
+    dtypes = {entry["column"]: entry["dtype_after"] for entry in report}
+    assert (dtypes["Units"], dtypes["Delta"], dtypes["Price"], dtypes["Region"]) == ("uint8", "int8", "float64", "category")
+    # High-cardinality text is left as it was
+    assert dtypes["Id"] == str(expected["Id"].dtype)
+    # Small integer types must not overflow when summed
+    assert optimized["Units"].sum() == 20_000_000
+    assert optimized["Delta"].sum() == expected["Delta"].sum()
+    assert optimized["Price"].sum() == expected["Price"].sum()
+    pd.testing.assert_frame_equal(optimized.astype(expected.dtypes.to_dict()), expected)
+    assert sum(entry["bytes_after"] for entry in report) < sum(entry["bytes_before"] for entry in report)
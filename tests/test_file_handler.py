@@ -0,0 +1,43 @@
+import io
+
+import pandas as pd
+import pyarrow as pa
+
+from app.services.file_handler import read_csv_streaming
+
+
+def _csv(df: pd.DataFrame) -> io.BytesIO:
+    return io.BytesIO(df.to_csv(index=False).encode())
+
+
+def test_type_change_after_first_chunk_is_read_as_text():
+    codes = [str(i) for i in range(100)] + [f"A{i}" for i in range(50)]
+    df = pd.DataFrame({"Code": codes, "Sales": range(150), "Flag": [True] * 100 + ["maybe"] * 50})
+
+    result = read_csv_streaming(_csv(df), chunk_rows=40, progress=None)
+
+    assert result["Code"].tolist() == codes
+    assert result["Flag"].map(type).eq(str).all()
+    assert {type(v) for v in result["Code"]} == {str}
+    assert result["Sales"].dtype.kind == "i"
+    # The upload is persisted as Arrow, which needs one type per column
+    pa.Table.from_pandas(result)
+
+
+def test_numeric_chunks_widen_to_float():
+    df = pd.DataFrame({"Sales": [1] * 50 + [1.5] * 50 + [None] * 50})
+
+    result = read_csv_streaming(_csv(df), chunk_rows=50, progress=None)
+
+    assert result["Sales"].dtype == "float64"
+    assert result["Sales"].iloc[60] == 1.5
+    assert result["Sales"].iloc[120] != result["Sales"].iloc[120]
+
+
+def test_matches_whole_file_parse():
+    df = pd.DataFrame({"Date": pd.date_range("2024-01-01", periods=250).astype(str), "Sales": range(250), "Region": ["N", "S"] * 125})
+    raw = df.to_csv(index=False).encode()
+
+    result = read_csv_streaming(io.BytesIO(raw), chunk_rows=100, progress=None)
+
+    pd.testing.assert_frame_equal(result, pd.read_csv(io.BytesIO(raw)))
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth import crypt
+from google.auth import jwt as google_jwt
+
+from app.services import google_certs
+from app.services.google_certs import GoogleCertCache, max_age_seconds
+
+AUDIENCE = "client-id.apps.googleusercontent.com"
+
+
+def _key_pair() -> tuple[str, str]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    public_pem = key.public_key().public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return private_pem.decode(), public_pem.decode()
+
+
+OLD_PRIVATE, OLD_PUBLIC = _key_pair()
+NEW_PRIVATE, NEW_PUBLIC = _key_pair()
+
+
+def _token(private_pem: str, kid: str, **claims) -> str:
+    now = int(time.time())
+    payload = {"iss": "https://accounts.google.com", "aud": AUDIENCE, "sub": "123", "email": "a@example.com", "iat": now, "exp": now + 600, **claims}
+    return google_jwt.encode(crypt.RSASigner.from_string(private_pem, key_id=kid), payload).decode()
+
+
+class Fetcher:
+    """Serves the given cert sets in turn (the last one repeats) and counts calls."""
+
+    def __init__(self, *responses, ttl: float = 300):
+        self.responses = list(responses)
+        self.ttl = ttl
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        response = self.responses[min(self.calls, len(self.responses)) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response, self.ttl
+
+
+def test_signed_token_is_verified_from_cached_certs():
+    fetcher = Fetcher({"old": OLD_PUBLIC})
+    cache = GoogleCertCache(fetcher)
+
+    async def scenario():
+        tokens = [_token(OLD_PRIVATE, "old") for _ in range(20)]
+        return await asyncio.gather(*(cache.verify(token, AUDIENCE) for token in tokens))
+
+    infos = asyncio.run(scenario())
+
+    assert all(info["email"] == "a@example.com" for info in infos)
+    assert fetcher.calls == 1
+
+
+@pytest.mark.parametrize("claims", [{"aud": "someone-else"}, {"iss": "https://evil.example.com"}, {"exp": int(time.time()) - 3600}])
+def test_invalid_claims_are_rejected(claims):
+    cache = GoogleCertCache(Fetcher({"old": OLD_PUBLIC}))
+
+    with pytest.raises(ValueError):
+        asyncio.run(cache.verify(_token(OLD_PRIVATE, "old", **claims), AUDIENCE))
+
+
+def test_token_signed_with_another_key_is_rejected():
+    cache = GoogleCertCache(Fetcher({"old": OLD_PUBLIC}))
+
+    with pytest.raises(ValueError):
+        asyncio.run(cache.verify(_token(NEW_PRIVATE, "old"), AUDIENCE))
+    with pytest.raises(ValueError):
+        asyncio.run(cache.verify("not-a-token", AUDIENCE))
+
+
+def test_unknown_kid_refetches_rotated_certs(monkeypatch):
+    monkeypatch.setattr(google_certs, "GOOGLE_CERTS_MIN_REFRESH_SECONDS", 0)
+    fetcher = Fetcher({"old": OLD_PUBLIC}, {"old": OLD_PUBLIC, "new": NEW_PUBLIC})
+    cache = GoogleCertCache(fetcher)
+
+    async def scenario():
+        await cache.verify(_token(OLD_PRIVATE, "old"), AUDIENCE)
+        return await cache.verify(_token(NEW_PRIVATE, "new"), AUDIENCE)
+
+    assert asyncio.run(scenario())["sub"] == "123"
+    assert fetcher.calls == 2
+
+
+def test_unknown_kid_refetches_are_rate_limited(monkeypatch):
+    monkeypatch.setattr(google_certs, "GOOGLE_CERTS_MIN_REFRESH_SECONDS", 60)
+    fetcher = Fetcher({"old": OLD_PUBLIC})
+    cache = GoogleCertCache(fetcher)
+
+    async def scenario():
+        await cache.verify(_token(OLD_PRIVATE, "old"), AUDIENCE)
+        rejected = 0
+        for i in range(20):
+            try:
+                await cache.verify(_token(NEW_PRIVATE, f"bogus-{i}"), AUDIENCE)
+            except ValueError:
+                rejected += 1
+        return rejected
+
+    assert asyncio.run(scenario()) == 20
+    assert fetcher.calls == 1
+
+
+def test_stale_certs_are_kept_when_a_refresh_fails():
+    fetcher = Fetcher({"old": OLD_PUBLIC}, RuntimeError("network down"), ttl=0)
+    cache = GoogleCertCache(fetcher)
+
+    async def scenario():
+        await cache.verify(_token(OLD_PRIVATE, "old"), AUDIENCE)
+        return await cache.verify(_token(OLD_PRIVATE, "old"), AUDIENCE)
+
+    assert asyncio.run(scenario())["sub"] == "123"
+    assert fetcher.calls == 2
+
+
+def test_max_age_from_cache_control():
+    assert max_age_seconds({"cache-control": "public, max-age=19845, must-revalidate", "age": "45"}) == 19800
+    assert max_age_seconds({"cache-control": "no-cache"}) is None
@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import Graph
+from app.services.dashboard_panels import PANEL_MAX_BARS
+
+
+def _series(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "Date": pd.date_range("2020-01-01", periods=rows, freq="min"),
+        "Gross_Margin_%": np.random.default_rng(0).random(rows),
+    })
+
+
+def test_large_bar_chart_draws_a_bounded_number_of_bars():
+    fig = Graph.draw_chart("bar", _series(200_000), {"large": True})
+
+    assert len(fig.axes[0].patches) <= PANEL_MAX_BARS
+
+
+def test_small_bar_chart_keeps_every_row():
+    fig = Graph.draw_chart("bar", _series(50), {"large": False})
+
+    assert len(fig.axes[0].patches) == 50
+
+
+def test_large_pie_chart_draws_row_range_slices():
+    data = pd.DataFrame({"Contribution_%": np.full(100_000, 0.001)})
+
+    fig = Graph.draw_chart("pie", data, {"large": True})
+
+    assert len(fig.axes[0].patches) == 12
+
+
+def test_chart_data_is_prepared_only_for_charts_about_to_run(tmp_path, monkeypatch):
+    df = pd.DataFrame({f"m{i}": np.arange(100.0) for i in range(10)})
+    df.to_csv(tmp_path / "metrics.csv", index=False)
+    lock = threading.Lock()
+    outstanding = {"now": 0, "max": 0}
+    chart_data = Graph.chart_data
+
+    def tracking_chart_data(df, chart):
+        with lock:
+            outstanding["now"] += 1
+            outstanding["max"] = max(outstanding["max"], outstanding["now"])
+        return chart_data(df, chart)
+
+    def fake_render(chart, data, path):
+        time.sleep(0.01)
+        with lock:
+            outstanding["now"] -= 1
+        return 0.001
+
+    # Threads instead of spawned processes, so the fakes above are used
+    monkeypatch.setattr(Graph, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(Graph, "chart_data", tracking_chart_data)
+    monkeypatch.setattr(Graph, "render_chart", fake_render)
+
+    manifest = Graph.generate_graphs(str(tmp_path / "metrics.csv"), str(tmp_path / "graphs"), workers=2)
+
+    # 3 charts per column plus the heatmap, never more than two queued per worker
+    assert manifest["rendered"] == 31
+    assert all(entry["status"] == "ok" for entry in manifest["charts"].values())
+    assert outstanding["max"] <= 2 * Graph.GRAPH_TASKS_PER_WORKER
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.services.http_cache import conditional_response, make_etag
+
+
+def _client(builds: list) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/data")
+    def data(request: Request, version: int = 1):
+        def build():
+            builds.append(version)
+            return JSONResponse({"version": version})
+        return conditional_response(request, make_etag("dataset", version), build, vary="Accept")
+
+    return TestClient(app)
+
+
+def test_first_request_is_tagged():
+    response = _client([]).get("/data")
+
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["vary"] == "Accept"
+
+
+@pytest.mark.parametrize("if_none_match", [
+    "{etag}",
+    "{strong}",
+    '"other", {etag}',
+    "*",
+])
+def test_matching_etag_gets_304_without_building_the_body(if_none_match):
+    builds = []
+    client = _client(builds)
+    etag = client.get("/data").headers["etag"]
+
+    response = client.get("/data", headers={"If-None-Match": if_none_match.format(etag=etag, strong=etag.removeprefix("W/"))})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert builds == [1]
+
+
+def test_new_version_gets_a_new_etag():
+    builds = []
+    client = _client(builds)
+    etag = client.get("/data").headers["etag"]
+
+    response = client.get("/data", params={"version": 2}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json() == {"version": 2}
+    assert response.headers["etag"] != etag
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from app.services import large_data
+
+
+def test_bucket_slices_cover_every_row_once():
+    values = np.arange(1_000, dtype="float64")
+
+    labels, totals = large_data.bucket_slices(values, np.arange(1_000), max_slices=4)
+
+    assert labels == ["0–249", "250–499", "500–749", "750–999"]
+    assert totals.sum() == values.sum()
+    assert totals[0] == values[:250].sum()
+
+
+def test_bucket_slices_ignore_missing_and_negative_values():
+    labels, totals = large_data.bucket_slices([1, np.nan, -5, 2], ["a", "b", "c", "d"], max_slices=12)
+
+    assert labels == ["a–a", "b–b", "c–c", "d–d"]
+    assert totals.tolist() == [1, 0, 0, 2]
+
+
+def _chunks(n: int, size: int):
+    for start in range(0, n, size):
+        yield pd.DataFrame({"row": np.arange(start, min(start + size, n))})
+
+
+def test_reservoir_sample_size_order_and_uniqueness():
+    sample = large_data.reservoir_sample(_chunks(100_000, 7_000), k=1_000, seed=3)
+
+    rows = sample["row"].to_numpy()
+    assert len(rows) == 1_000
+    assert np.all(np.diff(rows) > 0)
+    assert rows.min() >= 0 and rows.max() < 100_000
+
+
+def test_reservoir_sample_is_uniform():
+    # Across many seeds every row should be kept k/n of the time
+    n, k, runs = 200, 20, 600
+    kept = np.zeros(n)
+    for seed in range(runs):
+        kept[large_data.reservoir_sample(_chunks(n, 30), k=k, seed=seed)["row"].to_numpy()] += 1
+
+    expected = runs * k / n
+    assert np.abs(kept - expected).max() < 5 * np.sqrt(expected)
+    # Rows from the first chunk (which fill the reservoir) are not favoured
+    assert abs(kept[:30].mean() - kept[-30:].mean()) < 0.1 * expected
+
+
+def test_reservoir_sample_of_short_stream_keeps_everything():
+    sample = large_data.reservoir_sample(_chunks(50, 20), k=100)
+
+    assert sample["row"].tolist() == list(range(50))
+    assert large_data.reservoir_sample([], k=10).empty
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.services import chart_render
+from app.services.chart_render import RenderCache
+
+
+def test_concurrent_requests_share_one_render(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_run_in_pool(render, spec):
+        calls.append(spec)
+        await asyncio.sleep(0.01)
+        return b"png"
+
+    monkeypatch.setattr(chart_render, "run_in_pool", fake_run_in_pool)
+    cache = RenderCache(directory=str(tmp_path))
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_render("k", "png", dict) for _ in range(20)))
+
+    assert asyncio.run(scenario()) == [b"png"] * 20
+    assert len(calls) == 1
+    assert (tmp_path / "k.png").read_bytes() == b"png"
+
+
+def test_cancelled_render_does_not_strand_waiting_requests(tmp_path, monkeypatch):
+    calls = []
+
+    async def fake_run_in_pool(render, spec):
+        calls.append(spec)
+        await asyncio.sleep(0.05)
+        return f"render {len(calls)}".encode()
+
+    monkeypatch.setattr(chart_render, "run_in_pool", fake_run_in_pool)
+    cache = RenderCache(directory=str(tmp_path))
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.get_or_render("k", "png", dict))
+        # Let the leader start rendering before the second request arrives
+        while not calls:
+            await asyncio.sleep(0.001)
+        follower = asyncio.ensure_future(cache.get_or_render("k", "png", dict))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        body = await asyncio.wait_for(follower, timeout=2)
+        return leader, body
+
+    leader, body = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    # The waiting request rendered the chart itself instead of hanging
+    assert body == b"render 2"
+    assert cache.stats()["rendering"] == 0
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.result_cache import ResultCache
+
+
+def _dataset(version: int = 1):
+    return SimpleNamespace(dataset_id="ds", version=version)
+
+
+def _series(n: int):
+    return lambda: (np.arange(n, dtype="int64"), np.zeros(n))
+
+
+def test_equivalent_requests_share_an_entry():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    cache.get_or_compute(_dataset(), "chart", {"metric": "Sales", "bucket": None}, compute)
+    cache.get_or_compute(_dataset(), "chart", {"bucket": None, "metric": "Sales"}, compute)
+
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_evicts_least_recently_used_results_to_stay_within_the_byte_budget():
+    # Each result holds two arrays of 1000 eight-byte values
+    cache = ResultCache(max_bytes=50_000)
+    for i in range(3):
+        cache.get_or_compute(_dataset(), "chart", {"metric": f"m{i}"}, _series(1000))
+    # Touch m0 so m1 becomes the oldest entry
+    cache.get_or_compute(_dataset(), "chart", {"metric": "m0"}, _series(1000))
+    cache.get_or_compute(_dataset(), "chart", {"metric": "m3"}, _series(1000))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 50_000
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+
+    computed = []
+    cache.get_or_compute(_dataset(), "chart", {"metric": "m0"}, lambda: computed.append("m0"))
+    cache.get_or_compute(_dataset(), "chart", {"metric": "m1"}, lambda: computed.append("m1"))
+    assert computed == ["m1"]
+
+
+def test_result_larger_than_the_budget_is_not_kept():
+    cache = ResultCache(max_bytes=10_000)
+    cache.get_or_compute(_dataset(), "chart", {"metric": "small"}, _series(10))
+
+    labels, values = cache.get_or_compute(_dataset(), "chart", {"metric": "huge"}, _series(100_000))
+
+    assert len(values) == 100_000
+    # The small entry is not pushed out by a result that could never fit
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 0
+
+
+def test_entry_count_is_bounded():
+    cache = ResultCache(max_entries=2)
+    for i in range(4):
+        cache.get_or_compute(_dataset(), "chart", {"metric": f"m{i}"}, _series(10))
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 2
+
+
+def test_new_version_drops_the_old_entries():
+    cache = ResultCache()
+    cache.get_or_compute(_dataset(1), "chart", {"metric": "Sales"}, _series(1000))
+    cache.get_or_compute(_dataset(2), "chart", {"metric": "Sales"}, _series(10))
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["bytes"] < 1000
@@ -0,0 +1,82 @@
+import os
+
+import pandas as pd
+
+from app.services.storage import to_arrow_table
+
+
+def test_mixed_object_columns_are_stored_as_text():
+    df = pd.DataFrame({
+        "Code": pd.Series([5, "5", "A7", None], dtype=object),
+        "Region": pd.Categorical([1, "N", "N", 1]),
+        "Sales": [1.0, 2.0, 3.0, 4.0],
+    })
+
+    result = to_arrow_table(df).to_pandas()
+
+    assert result["Code"].tolist()[:3] == ["5", "5", "A7"]
+    assert pd.isna(result["Code"].iloc[3])
+    assert result["Region"].tolist() == ["1", "N", "N", "1"]
+    assert result["Sales"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_clean_frames_keep_their_types():
+    df = pd.DataFrame({"Region": pd.Categorical(["N", "S"]), "Sales": [1, 2]})
+
+    result = to_arrow_table(df).to_pandas()
+
+    assert isinstance(result["Region"].dtype, pd.CategoricalDtype)
+    assert result["Sales"].dtype == "int64"
+
+
+def _frame(value: float) -> pd.DataFrame:
+    return pd.DataFrame({"Sales": [value] * 3})
+
+
+def test_upload_from_another_worker_is_seen(store):
+    from app.services import storage
+
+    # Each worker process has its own index reader over the same file
+    other_worker = storage.SharedIndex()
+    storage.save_dataset("a", _frame(1.0), "first.csv", storage.new_version())
+    assert other_worker.lookup(storage.dataset_id("a"))["filename"] == "first.csv"
+
+    old_path = other_worker.lookup(storage.dataset_id("a"))["path"]
+    storage.save_dataset("a", _frame(2.0), "second.csv", storage.new_version())
+
+    entry = other_worker.lookup(storage.dataset_id("a"))
+    assert entry["filename"] == "second.csv"
+    # The replaced segment is removed once the index points at the new one
+    assert not os.path.exists(old_path)
+    df, info = storage.load_dataset(entry["path"])
+    assert info["filename"] == "second.csv"
+    assert df["Sales"].tolist() == [2.0, 2.0, 2.0]
+
+
+def test_load_of_a_removed_segment_returns_none(store):
+    from app.services import storage
+
+    assert storage.load_dataset(storage.segment_path("missing", 1)) is None
+
+
+def test_registry_rereads_the_index_when_its_segment_was_replaced(store, monkeypatch):
+    from app.services import storage
+    from app.services.dataset_registry import DatasetRegistry
+
+    storage.save_dataset("a", _frame(1.0), "first.csv", storage.new_version())
+    stale = storage.lookup_dataset("a")
+    storage.save_dataset("a", _frame(2.0), "second.csv", storage.new_version())
+
+    # The first index read happens just before another worker replaces the segment
+    lookup = storage.lookup_dataset
+    reads = []
+
+    def lookup_once_stale(owner):
+        reads.append(owner)
+        return stale if len(reads) == 1 else lookup(owner)
+
+    monkeypatch.setattr(storage, "lookup_dataset", lookup_once_stale)
+    dataset = DatasetRegistry()._load_persisted("a")
+
+    assert dataset.filename == "second.csv"
+    assert dataset.df["Sales"].tolist() == [2.0, 2.0, 2.0]
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from app.main import build_summary
+from app.services.dataset_registry import Dataset
+
+
+def _dataset(df: pd.DataFrame) -> Dataset:
+    return Dataset(owner="owner", filename="data.csv", df=df, nbytes=0, version=1)
+
+
+def test_empty_profit_column_reports_zero():
+    df = pd.DataFrame({"Sales": [1.0, 2.0], "Profit": [np.nan, np.nan]})
+
+    summary = build_summary(_dataset(df))
+
+    assert summary["total_sales"] == 3.0
+    assert summary["avg_profit"] == summary["max_profit"] == summary["min_profit"] == 0
+    # Renders as plain JSON (NaN would raise here)
+    JSONResponse(content=summary)
+
+
+def test_profit_stats_ignore_missing_values():
+    df = pd.DataFrame({"Profit": [1.0, np.nan, 3.0]})
+
+    summary = build_summary(_dataset(df))
+
+    assert (summary["avg_profit"], summary["max_profit"], summary["min_profit"]) == (2.0, 3.0, 1.0)
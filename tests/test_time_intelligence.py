@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.date_index import DateIndex
+from app.services.time_intelligence import TimeCube, shift_months
+
+
+def _daily(start: str, end: str, value: float = 1.0) -> TimeCube:
+    dates = pd.Series(pd.date_range(start, end, freq="D"))
+    return TimeCube.from_index(DateIndex(dates), np.full(len(dates), value))
+
+
+def test_periods_stay_within_the_right_year():
+    # One unit per day; the same month of earlier years must not be counted
+    kpis = _daily("2022-01-01", "2024-05-15").kpis()
+
+    assert kpis["as_of"] == "2024-05-15"
+    assert kpis["mtd"] == 15
+    assert kpis["qtd"] == 30 + 15  # April + May 1-15
+    assert kpis["ytd"] == 31 + 29 + 31 + 30 + 15
+    assert kpis["previous_year_total"] == 365
+    assert kpis["previous_ytd"] == 31 + 28 + 31 + 30 + 15
+    assert kpis["previous_mtd"] == 15
+
+
+def test_growth_rates_compare_like_with_like():
+    dates = pd.Series(pd.date_range("2022-01-01", "2024-03-31", freq="D"))
+    # Daily value doubles every year
+    values = np.where(dates.dt.year == 2022, 1.0, np.where(dates.dt.year == 2023, 2.0, 4.0))
+    kpis = TimeCube.from_index(DateIndex(dates), values).kpis()
+
+    assert kpis["yoy_growth_pct"] == pytest.approx(100 * (4 * 91 - 2 * 90) / (2 * 90))
+    assert kpis["mom_growth_pct"] == pytest.approx(100 * (31 - 29) / 29)
+    # YTD to Mar 31: 90 units in 2022, 364 in 2024 (leap year), over two years
+    assert kpis["cagr_pct"] == pytest.approx(((4 * 91) / 90) ** 0.5 * 100 - 100)
+
+
+def test_as_of_and_missing_values():
+    dates = pd.Series(pd.to_datetime(["2024-01-05", "2024-02-10", "2024-02-20", "2024-03-01", None]))
+    cube = TimeCube.from_index(DateIndex(dates), np.array([1.0, 2.0, np.nan, 4.0, 100.0]))
+
+    kpis = cube.kpis("2024-02-29")
+
+    assert (kpis["mtd"], kpis["qtd"], kpis["ytd"]) == (2.0, 3.0, 3.0)
+    assert kpis["cagr_pct"] is None
+    assert cube.kpis("2023-06-30")["ytd"] == 0
+
+
+def test_rollups():
+    cube = _daily("2023-11-30", "2024-01-02")
+
+    assert cube.rollup("month") == (["2023-11", "2023-12", "2024-01"], pytest.approx([1, 31, 2]))
+    assert cube.rollup("quarter")[0] == ["2023-Q4", "2024-Q1"]
+    assert cube.rollup("year")[1].tolist() == [32, 2]
+    assert len(cube.rollup("day")[0]) == 34
+    with pytest.raises(ValueError):
+        cube.rollup("week")
+
+
+def test_empty_cube():
+    cube = TimeCube.from_index(DateIndex(pd.Series(pd.to_datetime([None, None]))), np.array([1.0, 2.0]))
+
+    assert cube.kpis() is None
+    assert cube.rollup("month")[0] == []
+
+
+@pytest.mark.parametrize("day, months, expected", [
+    ("2024-03-31", -1, "2024-02-29"),
+    ("2024-02-29", -12, "2023-02-28"),
+    ("2024-05-31", -1, "2024-04-30"),
+    ("2024-01-15", 1, "2024-02-15"),
+])
+def test_shift_months_clips_to_month_end(day, months, expected):
+    assert str(shift_months(np.datetime64(day), months)) == expected
+
+
+def test_endpoint(store):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import storage
+
+    owner = "session:abc"
+    df = pd.DataFrame({"Date": pd.date_range("2023-01-01", "2024-02-10", freq="D"), "Region": "N"})
+    df["Sales"] = 1.0
+    storage.save_dataset(owner, df, "sales.csv", storage.new_version())
+    client = TestClient(app, cookies={"morph_session": "abc"})
+
+    response = client.get("/api/time-intelligence", params={"as_of": "2024-01-31"})
+    assert response.status_code == 200
+    assert response.json()["mtd"] == 31 and response.json()["previous_ytd"] == 31
+    assert client.get("/api/time-intelligence", params={"as_of": "2024-01-31"}, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    rollup = client.get("/api/time-intelligence/rollup", params={"period": "year"}).json()
+    assert rollup["labels"] == ["2023", "2024"] and rollup["values"] == [365, 41]
+
+    assert client.get("/api/time-intelligence", params={"metric": "Region"}).status_code == 400
+    assert client.get("/api/time-intelligence", params={"metric": "Missing"}).status_code == 400
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.services.user_cache import UserCache
+
+
+class Loader:
+    """Counts database lookups; each one takes a little while."""
+
+    def __init__(self, user: dict | None = None, error: Exception | None = None):
+        self.user = user
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error is not None:
+            raise self.error
+        return None if self.user is None else dict(self.user, version=self.calls)
+
+
+def test_concurrent_misses_share_one_lookup():
+    cache = UserCache()
+    load = Loader({"email": "a@example.com"})
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get("a@example.com", load) for _ in range(100)))
+
+    users = asyncio.run(scenario())
+
+    assert load.calls == 1
+    assert all(user == {"email": "a@example.com", "version": 1} for user in users)
+    assert cache.stats()["misses"] == 1
+
+
+def test_cached_until_invalidated():
+    cache = UserCache()
+    load = Loader({"email": "a@example.com"})
+
+    async def scenario():
+        first = await cache.get("a@example.com", load)
+        second = await cache.get("a@example.com", load)
+        cache.invalidate("a@example.com")
+        third = await cache.get("a@example.com", load)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert (first["version"], second["version"], third["version"]) == (1, 1, 2)
+
+
+def test_lookup_started_before_invalidate_is_not_joined_or_kept():
+    cache = UserCache()
+    load = Loader({"email": "a@example.com"})
+
+    async def scenario():
+        stale = asyncio.ensure_future(cache.get("a@example.com", load))
+        await asyncio.sleep(0)
+        cache.invalidate("a@example.com")
+        fresh = await cache.get("a@example.com", load)
+        await stale
+        again = await cache.get("a@example.com", load)
+        return fresh, again
+
+    fresh, again = asyncio.run(scenario())
+
+    assert load.calls == 2
+    assert fresh["version"] == again["version"] == 2
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = UserCache()
+    load = Loader(error=RuntimeError("database down"))
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get("a@example.com", load) for _ in range(10)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert load.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get("a@example.com", load))
+    assert load.calls == 2
+
+
+def test_unknown_users_are_not_cached():
+    cache = UserCache()
+    load = Loader(None)
+
+    async def scenario():
+        return await cache.get("new@example.com", load), await cache.get("new@example.com", load)
+
+    assert asyncio.run(scenario()) == (None, None)
+    assert load.calls == 2
+
+
+def test_cancelled_lookup_does_not_strand_waiting_requests():
+    cache = UserCache()
+    load = Loader({"email": "a@example.com"})
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.get("a@example.com", load))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get("a@example.com", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        user = await asyncio.wait_for(follower, timeout=1)
+        return leader, user
+
+    leader, user = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    # The waiting request looked the user up again instead of hanging
+    assert user == {"email": "a@example.com", "version": 2}
+    assert cache.stats()["entries"] == 1
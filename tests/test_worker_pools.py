@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services import chart_render, ingest_jobs
+
+
+def _wait_for_job(job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = ingest_jobs.get_job(job_id)
+        if job is not None and job["status"] in ("done", "error"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _stage(tmp_path, name: str) -> tuple[str, str, int]:
+    path = tmp_path / name
+    path.write_bytes(b"a,b\n1,2\n")
+    with open(path, "rb") as f:
+        return ingest_jobs.stage_upload(f, name)
+
+
+def test_ingest_recovers_after_worker_dies(tmp_path, monkeypatch):
+    # Job records and staged files use paths relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_jobs, "INGEST_WORKERS", 1)
+    ingest_jobs.shutdown_pool()
+    try:
+        # The only worker dies (as if OOM-killed) before it gets to the job
+        ingest_jobs._get_pool().submit(os._exit, 1)
+        job_id, raw_path, size = _stage(tmp_path, "first.txt")
+        ingest_jobs.submit_ingest(job_id, "owner", raw_path, "first.txt", size)
+
+        job = _wait_for_job(job_id)
+        assert job["status"] == "error"
+        assert "crashed" in job["message"]
+        assert not os.path.exists(raw_path)
+
+        # The next upload gets a fresh pool; the job runs and reports its own error
+        job_id, raw_path, size = _stage(tmp_path, "second.txt")
+        ingest_jobs.submit_ingest(job_id, "owner", raw_path, "second.txt", size)
+        job = _wait_for_job(job_id)
+        assert job["status"] == "error"
+        assert job["message"] == "Error parsing file: Unsupported file format"
+    finally:
+        ingest_jobs.shutdown_pool()
+
+
+def test_render_pool_recovers_after_worker_dies():
+    async def scenario():
+        with pytest.raises(BrokenProcessPool):
+            await chart_render.run_in_pool(os._exit, 1)
+        return await chart_render.run_in_pool(abs, -3)
+
+    chart_render.shutdown_pool()
+    try:
+        assert asyncio.run(scenario()) == 3
+    finally:
+        chart_render.shutdown_pool()